@@ -2,19 +2,26 @@ require('dotenv').config();
 const express = require('express');
 const bodyParser = require('body-parser');
 const crypto = require('crypto');
-const axios = require('axios');
 
 const app = express();
 const PORT = process.env.PORT || 3000;
 
 // Environment variables
 const VERIFY_TOKEN = process.env.VERIFY_TOKEN;
-const PAGE_ACCESS_TOKEN = process.env.PAGE_ACCESS_TOKEN;
 const APP_SECRET = process.env.APP_SECRET;
 const ADMIN_API_TOKEN = process.env.ADMIN_API_TOKEN; // For admin dashboard authentication
 
 // Database integration
 const db = require('./services/database');
+const canvas = require('./services/canvasApi');
+const messenger = require('./services/messengerApi');
+const { BoundedMap } = require('./services/boundedMap');
+const {
+  MANILA_DATE_FORMAT,
+  MANILA_DATE_TIME_FORMAT,
+  MANILA_WEEKDAY_FORMAT,
+  getManilaParts
+} = require('./services/manilaTime');
 
 // Clean up expired sessions periodically (every hour)
 setInterval(async () => {
@@ -25,6 +32,18 @@ setInterval(async () => {
 app.use(bodyParser.json({ verify: verifyRequestSignature }));
 app.use(express.static('public'));
 
+// Secrets compared on every request, encoded once
+const VERIFY_TOKEN_BUFFER = Buffer.from(VERIFY_TOKEN || '');
+const ADMIN_API_TOKEN_BUFFER = Buffer.from(ADMIN_API_TOKEN || '');
+
+// Constant-time comparison of a request-supplied string against a secret
+function safeEqual(value, expectedBuffer) {
+  if (typeof value !== 'string') return false;
+  const valueBuffer = Buffer.from(value);
+  return valueBuffer.length === expectedBuffer.length &&
+    crypto.timingSafeEqual(valueBuffer, expectedBuffer);
+}
+
 // Verify request signature for security
 function verifyRequestSignature(req, res, buf) {
   const signature = req.get('X-Hub-Signature-256');
@@ -39,7 +58,7 @@ function verifyRequestSignature(req, res, buf) {
     .update(buf)
     .digest('hex');
     
-  if (signature !== `sha256=${expectedSignature}`) {
+  if (!safeEqual(signature, Buffer.from(`sha256=${expectedSignature}`))) {
     console.error('Invalid signature');
     throw new Error('Invalid signature');
   }
@@ -58,7 +77,7 @@ function requireAdminAuth(req, res, next) {
     return res.status(401).json({ error: 'Missing X-Admin-Token header' });
   }
   
-  if (adminToken !== ADMIN_API_TOKEN) {
+  if (!safeEqual(adminToken, ADMIN_API_TOKEN_BUFFER)) {
     console.warn('Invalid admin token attempt');
     return res.status(403).json({ error: 'Invalid admin token' });
   }
@@ -79,9 +98,9 @@ app.get('/', (req, res) => {
 // Debug endpoint to check messenger profile settings
 app.get('/debug/menu', async (req, res) => {
   try {
-    const profileResponse = await axios.get(
-      `https://graph.facebook.com/v18.0/me/messenger_profile?fields=persistent_menu,get_started,greeting&access_token=${PAGE_ACCESS_TOKEN}`
-    );
+    const profileResponse = await messenger.graphGet(messenger.PROFILE_PATH, {
+      params: { fields: 'persistent_menu,get_started,greeting' }
+    });
     
     const hasMenu = profileResponse.data?.data?.[0]?.persistent_menu?.length > 0;
     const hasGetStarted = profileResponse.data?.data?.[0]?.get_started?.payload === 'GET_STARTED';
@@ -142,27 +161,19 @@ app.post('/debug/refresh-menu', async (req, res) => {
       success: true
     };
     
-    // Setup Get Started button if needed or forced
-    if (forceSetup || !currentStatus.hasGetStarted) {
-      try {
-        await setupGetStartedButton();
-        results.actions.push('✓ Get Started button configured');
-        if (useRetry) await delay(1500); // Longer delay when retrying
-      } catch (error) {
-        results.actions.push(`✗ Get Started button: ${error.message}`);
-        if (error.response?.data?.error?.code !== 613) {
-          results.success = false;
-        }
-      }
-    }
-    
-    // Setup menu if needed or forced
-    if (forceSetup || !currentStatus.hasMenu) {
+    // Setup Get Started button and menu in one profile update if needed or forced
+    const needsGetStarted = forceSetup || !currentStatus.hasGetStarted;
+    const needsMenu = forceSetup || !currentStatus.hasMenu;
+    if (needsGetStarted || needsMenu) {
       try {
-        await setupPersistentMenu();
-        results.actions.push('✓ Persistent menu configured');
+        // Only ?retry=true waits out rate limits with exponential backoff;
+        // otherwise a rate-limited update fails fast with a 429
+        await postMessengerProfile({ menu: needsMenu, getStarted: needsGetStarted }, useRetry ? 5 : 1);
+        if (needsGetStarted) results.actions.push('✓ Get Started button configured');
+        if (needsMenu) results.actions.push('✓ Persistent menu configured');
       } catch (error) {
-        results.actions.push(`✗ Persistent menu: ${error.message}`);
+        if (error.response?.data?.error?.code === 613 && !useRetry) throw error;
+        results.actions.push(`✗ Messenger profile: ${error.message}`);
         if (error.response?.data?.error?.code !== 613) {
           results.success = false;
         }
@@ -203,7 +214,7 @@ app.get('/webhook', (req, res) => {
   const challenge = req.query['hub.challenge'];
 
   if (mode && token) {
-    if (mode === 'subscribe' && token === VERIFY_TOKEN) {
+    if (mode === 'subscribe' && VERIFY_TOKEN && safeEqual(token, VERIFY_TOKEN_BUFFER)) {
       console.log('Webhook verified');
       res.status(200).send(challenge);
     } else {
@@ -216,27 +227,68 @@ app.get('/webhook', (req, res) => {
 });
 
 // Main webhook endpoint for receiving messages
-app.post('/webhook', async (req, res) => {
+// Tail of each sender's pending event chain, so a user's messages are still
+// handled one at a time and in order while different users run concurrently
+const senderQueues = new Map();
+
+// Facebook redelivers events it doesn't think were acknowledged, so each
+// event is handled once: keyed by its message id, or by sender, timestamp
+// and payload for postbacks that carry no mid
+const EVENT_DEDUPE_TTL_MS = 10 * 60 * 1000;
+const seenEvents = new BoundedMap(10000);
+
+function isDuplicateEvent(webhookEvent) {
+  const key = webhookEvent.message?.mid || webhookEvent.postback?.mid ||
+    `${webhookEvent.sender.id}:${webhookEvent.timestamp}:${webhookEvent.postback?.payload}`;
+  const now = Date.now();
+  const seenAt = seenEvents.get(key);
+  if (seenAt !== undefined && now - seenAt < EVENT_DEDUPE_TTL_MS) {
+    return true;
+  }
+  seenEvents.set(key, now);
+  return false;
+}
+
+function enqueueForSender(senderId, handle) {
+  const previous = senderQueues.get(senderId) || Promise.resolve();
+  const next = previous.then(handle).catch(error => {
+    console.error(`Error handling webhook event for ${senderId}:`, error);
+  });
+  senderQueues.set(senderId, next);
+  next.then(() => {
+    if (senderQueues.get(senderId) === next) senderQueues.delete(senderId);
+  });
+}
+
+app.post('/webhook', (req, res) => {
   const body = req.body;
 
-  if (body.object === 'page') {
-    // Process each entry asynchronously
-    for (const entry of body.entry) {
-      const webhookEvent = entry.messaging[0];
+  if (body.object !== 'page') {
+    res.sendStatus(404);
+    return;
+  }
+  
+  // Acknowledge straight away; Facebook retries deliveries that are slow to
+  // get a 200, and the replies go out through the Send API regardless
+  res.status(200).send('EVENT_RECEIVED');
+  
+  for (const entry of body.entry || []) {
+    for (const webhookEvent of entry.messaging || []) {
       console.log('Received webhook event:', JSON.stringify(webhookEvent, null, 2));
       
       const senderId = webhookEvent.sender.id;
       
+      if (isDuplicateEvent(webhookEvent)) {
+        console.warn(`Skipping redelivered webhook event from ${senderId}`);
+        continue;
+      }
+      
       if (webhookEvent.message) {
-        await handleMessage(senderId, webhookEvent.message);
+        enqueueForSender(senderId, () => handleMessage(senderId, webhookEvent.message));
       } else if (webhookEvent.postback) {
-        await handlePostback(senderId, webhookEvent.postback);
+        enqueueForSender(senderId, () => handlePostback(senderId, webhookEvent.postback));
       }
     }
-
-    res.status(200).send('EVENT_RECEIVED');
-  } else {
-    res.sendStatus(404);
   }
 });
 
@@ -328,12 +380,26 @@ async function clearUserSession(senderId) {
   return await db.clearUserSession(senderId);
 }
 
+// Text commands checked on every inbound message
+const MENU_COMMANDS = new Set(['menu', 'main menu', 'help']);
+const GREETINGS = new Set(['get started', 'hi', 'hello', 'hey', 'start', 'begin']);
+const DEBUG_PLANNER_COMMANDS = new Set(['test planner', 'test dashboard', 'debug planner']);
+
 // Handle incoming messages
 async function handleMessage(senderId, message) {
   console.log(`Message from ${senderId}:`, message.text);
   
+  // Fire-and-forget: the reply doesn't wait on the indicator's round trip
+  messenger.sendTypingIndicator(senderId);
+  
+  // Text messages need the session as well as the user; one query loads both
+  const isQuickReply = !!(message.quick_reply && message.quick_reply.payload);
+  const { user: existingUser, session } = message.text && !isQuickReply
+    ? await db.getUserWithSession(senderId)
+    : { user: await getUser(senderId), session: null };
+  
   // Get or create user
-  let user = await getUser(senderId);
+  let user = existingUser;
   if (!user) {
     user = await createUser(senderId);
     console.log(`New user created: ${senderId}`);
@@ -341,26 +407,27 @@ async function handleMessage(senderId, message) {
   
   if (message.text || message.quick_reply) {
     // Handle quick replies (Messenger sends them inside message.quick_reply)
-    if (message.quick_reply && message.quick_reply.payload) {
+    if (isQuickReply) {
       await handleQuickReply(senderId, message.quick_reply.payload);
       return;
     }
 
-    const userMessage = (message.text || '').toLowerCase().trim();
-    const session = await getUserSession(senderId);
-    
     // Handle session-based flows first
     if (session && session.flow) {
       await handleSessionFlow(senderId, message.text, session);
       return;
     }
     
+    // Normalized once for every command check below
+    const userMessage = (message.text || '').trim().toLowerCase();
+    
     // Handle common navigation commands first
-    if (['menu', 'main menu', 'help'].includes(userMessage)) {
+    if (MENU_COMMANDS.has(userMessage)) {
       if (user.is_onboarded) {
-        await sendWelcomeMessage(senderId);
-        // Add Android-friendly text menu after welcome
+        // Android-friendly text menu first: quick replies only show on the
+        // latest message, so the welcome carrying them goes last
         await sendAndroidFriendlyMenu(senderId);
+        await sendWelcomeMessage(senderId);
       } else {
         await startOnboardingFlow(senderId);
       }
@@ -368,13 +435,15 @@ async function handleMessage(senderId, message) {
     }
     
     if (userMessage === 'activate') {
-      await sendActivationMessage(senderId);
-      await updateUser(senderId, { subscription_tier: 'premium' });
+      await Promise.all([
+        sendActivationMessage(senderId),
+        updateUser(senderId, { subscription_tier: 'premium' })
+      ]);
       return;
     }
     
     // Hidden debug commands
-    if (['test planner', 'test dashboard', 'debug planner'].includes(userMessage)) {
+    if (DEBUG_PLANNER_COMMANDS.has(userMessage)) {
       await testPlannerNotesVisibility(senderId);
       return;
     }
@@ -392,7 +461,7 @@ async function handleMessage(senderId, message) {
     }
     
     // For returning users with common greetings, show main menu
-    if (['get started', 'hi', 'hello', 'hey', 'start', 'begin'].includes(userMessage)) {
+    if (GREETINGS.has(userMessage)) {
       await sendWelcomeMessage(senderId);
       return;
     }
@@ -404,32 +473,22 @@ async function handleMessage(senderId, message) {
 
 // Handle session-based conversation flows
 async function handleSessionFlow(senderId, messageText, session) {
-  const user = await getUser(senderId);
-  
   switch (session.flow) {
     case 'waiting_for_token':
       // User is expected to input a Canvas token
       if (isCanvasToken(messageText)) {
-        await clearUserSession(senderId); // Clear session before handling token
-        await handleCanvasToken(senderId, messageText);
+        // Clear session while handling the token; validation doesn't read it
+        await Promise.all([
+          clearUserSession(senderId),
+          handleCanvasToken(senderId, messageText)
+        ]);
       } else {
         // Invalid token format - provide helpful feedback
         await sendMessage({
           recipient: { id: senderId },
           message: {
             text: `❌ That doesn't look like a valid Canvas token.\n\nCanvas tokens are typically:\n• 64+ characters long\n• Contains letters, numbers, and ~ symbols\n• Example: 7~abcd1234efgh5678...\n\nPlease paste your Canvas Access Token here, or get help below:`,
-            quick_replies: [
-              {
-                content_type: "text",
-                title: "❓ Show Tutorial",
-                payload: "SHOW_TUTORIAL"
-              },
-              {
-                content_type: "text",
-                title: "🎥 Watch Video",
-                payload: "SHOW_VIDEO_TUTORIAL"
-              }
-            ]
+            quick_replies: INVALID_TOKEN_REPLIES
           }
         });
       }
@@ -437,39 +496,80 @@ async function handleSessionFlow(senderId, messageText, session) {
     case 'add_task':
       if (session.step === 'title') {
         // Store task title, then ask for course
-        await setUserSession(senderId, { flow: 'add_task', step: 'course', taskTitle: messageText });
-        await sendCourseSelection(senderId);
+        await Promise.all([
+          setUserSession(senderId, { flow: 'add_task', step: 'course', taskTitle: messageText }),
+          sendCourseSelection(senderId)
+        ]);
       } else if (session.step === 'course_other') {
         // User provided a custom course name
-        await setUserSession(senderId, { ...session, step: 'description', courseName: messageText, courseId: null });
-        await sendDescriptionRequest(senderId);
+        await Promise.all([
+          setUserSession(senderId, { ...session, step: 'description', courseName: messageText, courseId: null }),
+          sendDescriptionRequest(senderId)
+        ]);
       } else if (session.step === 'description') {
         // Store description then ask for due date
-        await setUserSession(senderId, { ...session, step: 'date', description: messageText });
-        await sendTaskDateRequest(senderId);
+        await Promise.all([
+          setUserSession(senderId, { ...session, step: 'date', description: messageText }),
+          sendTaskDateRequest(senderId)
+        ]);
       } else if (session.step === 'date') {
         // Only accept quick replies for date selection
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: "Please use the date buttons below to choose a due date." }
-        });
+        await sendTextMessage(senderId, "Please use the date buttons below to choose a due date.");
         await sendTaskDateRequest(senderId);
         return;
       } else if (session.step === 'time') {
         // Only accept quick replies for time selection
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: "Please use the time buttons below to choose a due time." }
-        });
+        await sendTextMessage(senderId, "Please use the time buttons below to choose a due time.");
         await sendTaskTimeRequest(senderId);
         return;
       }
       break;
     default:
-      await clearUserSession(senderId);
-      await sendGenericResponse(senderId);
-  }
-}
+      await Promise.all([
+        clearUserSession(senderId),
+        sendGenericResponse(senderId)
+      ]);
+  }
+}
+
+// Static quick-reply payload -> handler; unknown payloads get the generic response
+const QUICK_REPLY_HANDLERS = {
+  // Legacy payloads share handlers with their replacements
+  AGREE_TERMS: sendPoliciesPrompt,
+  CONSENT_CONTINUE: sendPoliciesPrompt,
+  PRIVACY_POLICY: sendPrivacyPolicyLink,
+  OPEN_PRIVACY_POLICY: sendPrivacyPolicyLink,
+  TERMS_OF_USE: sendTermsOfUseLink,
+  OPEN_TERMS_OF_USE: sendTermsOfUseLink,
+  AGREE_PRIVACY: async senderId => {
+    await updateUser(senderId, { agreed_privacy: true });
+    await maybeFinishConsent(senderId);
+  },
+  AGREE_TERMS_OF_USE: async senderId => {
+    await updateUser(senderId, { agreed_terms: true });
+    await maybeFinishConsent(senderId);
+  },
+  SHOW_VIDEO_TUTORIAL: sendVideoTutorial,
+  HAVE_TOKEN: promptForCanvasToken,
+  SHOW_TUTORIAL: sendTutorialMessage,
+  GET_TASKS_TODAY: sendTasksToday,
+  GET_TASKS_WEEK: sendTasksWeek,
+  SHOW_OVERDUE: sendOverdueTasks,
+  VIEW_ALL_UPCOMING: sendAllUpcoming,
+  ADD_NEW_TASK: startAddTaskFlow,
+  // Menu items
+  MY_TASKS: sendMyTasks,
+  CANVAS_SETUP: sendCanvasSetup,
+  HELP_AND_SUPPORT: sendHelpAndSupport,
+  UPGRADE_TO_PREMIUM: sendUpgradeToPremium,
+  TEST_CANVAS_CONNECTION: testCanvasConnection,
+  TEST_PLANNER_NOTES: testPlannerNotesVisibility,
+  VIEW_RECENT_TASKS: viewRecentCreatedTasks,
+  HOW_TO_USE: sendHowToUse,
+  REPORT_PROBLEM: sendReportProblem,
+  FEATURE_REQUEST: sendFeatureRequest,
+  CONTACT_SUPPORT: sendContactSupport
+};
 
 // Handle quick replies
 async function handleQuickReply(senderId, payload) {
@@ -479,259 +579,215 @@ async function handleQuickReply(senderId, payload) {
     const session = await getUserSession(senderId) || {};
     if (session.flow === 'add_task' && session.step === 'course') {
       if (courseToken === 'PERSONAL') {
-        await setUserSession(senderId, { ...session, step: 'description', courseId: null, courseName: 'Personal' });
-        await sendDescriptionRequest(senderId);
+        await Promise.all([
+          setUserSession(senderId, { ...session, step: 'description', courseId: null, courseName: 'Personal' }),
+          sendDescriptionRequest(senderId)
+        ]);
         return;
       }
       if (courseToken === 'OTHER') {
-        await setUserSession(senderId, { ...session, step: 'course_other' });
-        await sendAskCustomCourseName(senderId);
+        await Promise.all([
+          setUserSession(senderId, { ...session, step: 'course_other' }),
+          sendAskCustomCourseName(senderId)
+        ]);
         return;
       }
       // courseToken is numeric id
       const courseId = parseInt(courseToken, 10);
-      await setUserSession(senderId, { ...session, step: 'description', courseId, courseName: 'Selected Course' });
-      await sendDescriptionRequest(senderId);
+      await Promise.all([
+        setUserSession(senderId, { ...session, step: 'description', courseId, courseName: 'Selected Course' }),
+        sendDescriptionRequest(senderId)
+      ]);
       return;
     }
   }
   
-  switch (payload) {
-    case 'AGREE_TERMS': // legacy payload
-    case 'CONSENT_CONTINUE':
-      await sendPoliciesPrompt(senderId);
-      break;
-    case 'PRIVACY_POLICY': // legacy
-    case 'OPEN_PRIVACY_POLICY':
-      await sendPrivacyPolicyLink(senderId);
-      break;
-    case 'TERMS_OF_USE': // legacy
-    case 'OPEN_TERMS_OF_USE':
-      await sendTermsOfUseLink(senderId);
-      break;
-    case 'AGREE_PRIVACY':
-      await updateUser(senderId, { agreed_privacy: true });
-      await maybeFinishConsent(senderId);
-      break;
-    case 'AGREE_TERMS_OF_USE':
-      await updateUser(senderId, { agreed_terms: true });
-      await maybeFinishConsent(senderId);
-      break;
-    case 'SHOW_VIDEO_TUTORIAL':
-      await sendVideoTutorial(senderId);
-      break;
-    case 'HAVE_TOKEN':
-      // Set session to track that we're waiting for token input
-      await setUserSession(senderId, { flow: 'waiting_for_token' });
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "Great! Please paste your Canvas Access Token here and I'll validate it." }
-      });
-      break;
-    case 'SHOW_TUTORIAL':
-      await sendTutorialMessage(senderId);
-      break;
-    case 'GET_TASKS_TODAY':
-      await sendTasksToday(senderId);
-      break;
-    case 'GET_TASKS_WEEK':
-      await sendTasksWeek(senderId);
-      break;
-    case 'SHOW_OVERDUE':
-      await sendOverdueTasks(senderId);
-      break;
-    case 'VIEW_ALL_UPCOMING':
-      await sendAllUpcoming(senderId);
-      break;
-    case 'ADD_NEW_TASK':
-      await setUserSession(senderId, { flow: 'add_task', step: 'title' });
-      await sendAddTaskFlow(senderId);
-      break;
-    // New menu item handlers
-    case 'MY_TASKS':
-      await sendMyTasks(senderId);
-      break;
-    case 'CANVAS_SETUP':
-      await sendCanvasSetup(senderId);
-      break;
-    case 'HELP_AND_SUPPORT':
-      await sendHelpAndSupport(senderId);
-      break;
-    case 'UPGRADE_TO_PREMIUM':
-      await sendUpgradeToPremium(senderId);
-      break;
-    case 'TEST_CANVAS_CONNECTION':
-      await testCanvasConnection(senderId);
-      break;
-    case 'TEST_PLANNER_NOTES':
-      await testPlannerNotesVisibility(senderId);
-      break;
-    case 'VIEW_RECENT_TASKS':
-      await viewRecentCreatedTasks(senderId);
-      break;
-    case 'HOW_TO_USE':
-      await sendHowToUse(senderId);
-      break;
-    case 'REPORT_PROBLEM':
-      await sendReportProblem(senderId);
-      break;
-    case 'FEATURE_REQUEST':
-      await sendFeatureRequest(senderId);
-      break;
-    case 'CONTACT_SUPPORT':
-      await sendContactSupport(senderId);
-      break;
-    // Task due date quick replies
-    case 'TASK_DATE_TODAY':
-      await handleTaskDateQuickReply(senderId, 'today');
-      break;
-    case 'TASK_DATE_TOMORROW':
-      await handleTaskDateQuickReply(senderId, 'tomorrow');
-      break;
-    case 'TASK_DATE_FRIDAY':
-      await handleTaskDateQuickReply(senderId, 'friday');
-      break;
-    case 'TASK_DATE_NEXT_MONDAY':
-      await handleTaskDateQuickReply(senderId, 'nextmonday');
-      break;
-    // Task due time quick replies
-    case 'TASK_TIME_8AM':
-      await handleTaskTimeQuickReply(senderId, 8, 0);
-      break;
-    case 'TASK_TIME_12PM':
-      await handleTaskTimeQuickReply(senderId, 12, 0);
-      break;
-    case 'TASK_TIME_5PM':
-      await handleTaskTimeQuickReply(senderId, 17, 0);
-      break;
-    case 'TASK_TIME_8PM':
-      await handleTaskTimeQuickReply(senderId, 20, 0);
-      break;
-    case 'TASK_TIME_11_59PM':
-      await handleTaskTimeQuickReply(senderId, 23, 59);
-      break;
-    default:
-      await sendGenericResponse(senderId);
+  if (Object.prototype.hasOwnProperty.call(TASK_DUE_DATES, payload)) {
+    await handleTaskDateQuickReply(senderId, TASK_DUE_DATES[payload]);
+    return;
   }
+  if (Object.prototype.hasOwnProperty.call(TASK_DUE_TIMES, payload)) {
+    const { hour, minute } = TASK_DUE_TIMES[payload];
+    await handleTaskTimeQuickReply(senderId, hour, minute);
+    return;
+  }
+  
+  const handler = Object.prototype.hasOwnProperty.call(QUICK_REPLY_HANDLERS, payload)
+    ? QUICK_REPLY_HANDLERS[payload]
+    : sendGenericResponse;
+  await handler(senderId);
 }
 
 // Handle postback events (button clicks)
+// Postback payload -> handler; unknown payloads get the generic response
+const POSTBACK_HANDLERS = {
+  GET_STARTED: startOnboardingFlow,
+  // Legacy payload - redirect to new flow
+  AGREE_TERMS: sendCanvasTokenRequest,
+  SHOW_TUTORIAL: sendTutorialMessage,
+  SHOW_VIDEO_TUTORIAL: sendVideoTutorial,
+  HAVE_TOKEN: promptForCanvasToken,
+  GET_TASKS_TODAY: sendTasksToday,
+  GET_TASKS_WEEK: sendTasksWeek,
+  SHOW_OVERDUE: sendOverdueTasks,
+  VIEW_ALL_UPCOMING: sendAllUpcoming,
+  ADD_NEW_TASK: startAddTaskFlow,
+  // Persistent menu items
+  MY_TASKS: sendMyTasks,
+  CANVAS_SETUP: sendCanvasSetup,
+  HELP_AND_SUPPORT: sendHelpAndSupport,
+  UPGRADE_TO_PREMIUM: sendUpgradeToPremium
+};
+
 async function handlePostback(senderId, postback) {
   console.log(`Postback from ${senderId}:`, postback.payload);
   
+  messenger.sendTypingIndicator(senderId);
+  
   const payload = postback.payload;
   let user = await getUser(senderId);
   if (!user) {
     user = await createUser(senderId);
   }
   
-  switch (payload) {
-    case 'GET_STARTED':
-      await startOnboardingFlow(senderId);
-      break;
-    case 'AGREE_TERMS':
-      // Legacy handler - redirect to new flow
-      await sendTokenRequestMessage(senderId);
-      break;
-    case 'SHOW_TUTORIAL':
-      await sendTutorialMessage(senderId);
-      break;
-    case 'SHOW_VIDEO_TUTORIAL':
-      await sendVideoTutorial(senderId);
-      break;
-    case 'HAVE_TOKEN':
-      // Set session to track that we're waiting for token input
-      await setUserSession(senderId, { flow: 'waiting_for_token' });
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "Great! Please paste your Canvas Access Token here and I'll validate it." }
-      });
-      break;
-    case 'GET_TASKS_TODAY':
-      await sendTasksToday(senderId);
-      break;
-    case 'GET_TASKS_WEEK':
-      await sendTasksWeek(senderId);
-      break;
-    case 'SHOW_OVERDUE':
-      await sendOverdueTasks(senderId);
-      break;
-    case 'VIEW_ALL_UPCOMING':
-      await sendAllUpcoming(senderId);
-      break;
-    case 'ADD_NEW_TASK':
-      await setUserSession(senderId, { flow: 'add_task', step: 'title' });
-      await sendAddTaskFlow(senderId);
-      break;
-    // New menu item handlers for postbacks
-    case 'MY_TASKS':
-      await sendMyTasks(senderId);
-      break;
-    case 'CANVAS_SETUP':
-      await sendCanvasSetup(senderId);
-      break;
-    case 'HELP_AND_SUPPORT':
-      await sendHelpAndSupport(senderId);
-      break;
-    case 'UPGRADE_TO_PREMIUM':
-      await sendUpgradeToPremium(senderId);
-      break;
-    default:
-      await sendGenericResponse(senderId);
-  }
+  const handler = Object.prototype.hasOwnProperty.call(POSTBACK_HANDLERS, payload) ? POSTBACK_HANDLERS[payload] : sendGenericResponse;
+  await handler(senderId);
+}
+
+// Set session to track that we're waiting for token input; the prompt
+// doesn't depend on the write, so both go out together
+async function promptForCanvasToken(senderId) {
+  await Promise.all([
+    setUserSession(senderId, { flow: 'waiting_for_token' }),
+    sendTextMessage(senderId, "Great! Please paste your Canvas Access Token here and I'll validate it.")
+  ]);
+}
+
+async function startAddTaskFlow(senderId) {
+  await Promise.all([
+    setUserSession(senderId, { flow: 'add_task', step: 'title' }),
+    sendAddTaskFlow(senderId)
+  ]);
 }
 
+// Button template for Android users who can't see the persistent menu;
+// static, so built once at load
+const MAIN_MENU_ATTACHMENT = {
+  type: "template",
+  payload: {
+    template_type: "generic",
+    elements: [
+      {
+        title: "Main Menu",
+        subtitle: "Choose an option below:",
+        buttons: [
+          {
+            type: "postback",
+            title: "📋 My Tasks",
+            payload: "MY_TASKS"
+          },
+          {
+            type: "postback",
+            title: "🔧 Canvas Setup",
+            payload: "CANVAS_SETUP"
+          },
+          {
+            type: "postback",
+            title: "❓ Help & Support",
+            payload: "HELP_AND_SUPPORT"
+          }
+        ]
+      },
+      {
+        title: "Premium Features",
+        subtitle: "Unlock advanced capabilities",
+        buttons: [
+          {
+            type: "postback",
+            title: "🌟 Upgrade Premium",
+            payload: "UPGRADE_TO_PREMIUM"
+          }
+        ]
+      }
+    ]
+  }
+};
+
+// Sent on nearly every handler exit, so serialized once up front
+const MAIN_MENU_MESSAGE_JSON = JSON.stringify({ attachment: MAIN_MENU_ATTACHMENT });
+
 // Android-friendly text menu with button fallback
 async function sendAndroidFriendlyMenu(senderId) {
-  // Send button template for Android users who can't see persistent menu
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      attachment: {
-        type: "template",
-        payload: {
-          template_type: "generic",
-          elements: [
-            {
-              title: "Main Menu",
-              subtitle: "Choose an option below:",
-              buttons: [
-                {
-                  type: "postback",
-                  title: "📋 My Tasks",
-                  payload: "MY_TASKS"
-                },
-                {
-                  type: "postback",
-                  title: "🔧 Canvas Setup",
-                  payload: "CANVAS_SETUP"
-                },
-                {
-                  type: "postback",
-                  title: "❓ Help & Support",
-                  payload: "HELP_AND_SUPPORT"
-                }
-              ]
-            },
-            {
-              title: "Premium Features",
-              subtitle: "Unlock advanced capabilities",
-              buttons: [
-                {
-                  type: "postback",
-                  title: "🌟 Upgrade Premium",
-                  payload: "UPGRADE_TO_PREMIUM"
-                }
-              ]
-            }
-          ]
-        }
-      }
-    }
-  };
-  
-  await sendMessage(message);
-}
+  await sendSerializedMessage(senderId, MAIN_MENU_MESSAGE_JSON);
+}
+
+// Static quick-reply sets, built once instead of on every send
+
+// Help options after a message that does not look like a token
+const INVALID_TOKEN_REPLIES = [
+  { content_type: "text", title: "❓ Show Tutorial", payload: "SHOW_TUTORIAL" },
+  { content_type: "text", title: "🎥 Watch Video", payload: "SHOW_VIDEO_TUTORIAL" }
+];
+
+// Links to both policies
+const POLICIES_PROMPT_REPLIES = [
+  { content_type: "text", title: "📜 Privacy Policy", payload: "OPEN_PRIVACY_POLICY" },
+  { content_type: "text", title: "⚖️ Terms of Use", payload: "OPEN_TERMS_OF_USE" }
+];
+
+// Privacy Policy consent acknowledgement
+const AGREE_PRIVACY_REPLIES = [
+  { content_type: "text", title: "✅ I Agree", payload: "AGREE_PRIVACY" }
+];
+
+// Terms of Use consent acknowledgement
+const AGREE_TERMS_OF_USE_REPLIES = [
+  { content_type: "text", title: "✅ I Agree", payload: "AGREE_TERMS_OF_USE" }
+];
+
+// Canvas token request options
+const TOKEN_REQUEST_REPLIES = [
+  { content_type: "text", title: "✅ Yes, I have it", payload: "HAVE_TOKEN" },
+  { content_type: "text", title: "📖 Show Instructions", payload: "SHOW_TUTORIAL" },
+  { content_type: "text", title: "🎥 Watch Video Tutorial", payload: "SHOW_VIDEO_TUTORIAL" }
+];
+
+// Follow-up to the written token tutorial
+const TUTORIAL_FOLLOWUP_REPLIES = [
+  { content_type: "text", title: "🎥 Watch Video", payload: "SHOW_VIDEO_TUTORIAL" },
+  { content_type: "text", title: "✅ I got it!", payload: "HAVE_TOKEN" }
+];
+
+// Recovery options when Canvas rejects a token
+const TOKEN_INVALID_REPLIES = [
+  { content_type: "text", title: "❓ Show me how", payload: "SHOW_TUTORIAL" },
+  { content_type: "text", title: "🔄 Try Again", payload: "HAVE_TOKEN" }
+];
+
+// Recovery options when token validation errors out
+const TOKEN_ERROR_REPLIES = [
+  { content_type: "text", title: "🔄 Try Again", payload: "HAVE_TOKEN" },
+  { content_type: "text", title: "❓ Show Tutorial", payload: "SHOW_TUTORIAL" }
+];
+
+// Quick-access shortcuts shown after the welcome message
+const QUICK_ACCESS_REPLIES = [
+  {
+    content_type: "text",
+    title: "🔥 Due Today",
+    payload: "GET_TASKS_TODAY"
+  },
+  {
+    content_type: "text",
+    title: "⏰ Due This Week",
+    payload: "GET_TASKS_WEEK"
+  },
+  {
+    content_type: "text",
+    title: "📋 My Tasks",
+    payload: "MY_TASKS"
+  }
+];
 
 // Welcome message (simplified now that we have persistent menu)
 async function sendWelcomeMessage(senderId) {
@@ -753,183 +809,109 @@ async function sendWelcomeMessage(senderId) {
   const message = {
     recipient: { id: senderId },
     message: {
-      text: `Welcome back${userName}! 🎉\n\nUse the menu button (☰) below to access:\n📋 My Tasks - View your assignments\n🔧 Canvas Setup - Configure your connection\n❓ Help & Support - Get assistance\n🌟 Upgrade to Premium - Unlock all features\n\n📱 Android users: If you don't see the menu button, type 'menu' or use the quick options below.\n\nWhat would you like to do today?`
-    }
-  };
-  
-  await sendMessage(message);
-  
-  // Optionally show quick access to today's tasks
-  setTimeout(async () => {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: {
-        text: "Quick access:",
-        quick_replies: [
-          {
-            content_type: "text",
-            title: "🔥 Due Today",
-            payload: "GET_TASKS_TODAY"
-          },
-          {
-            content_type: "text",
-            title: "⏰ Due This Week",
-            payload: "GET_TASKS_WEEK"
-          },
-          {
-            content_type: "text",
-            title: "📋 My Tasks",
-            payload: "MY_TASKS"
-          }
-        ]
-      }
-    });
-  }, 1000);
-}
-
-// Start multi-step onboarding flow
-async function startOnboardingFlow(senderId) {
-  // Reset consent flags
-  await updateUser(senderId, { agreed_privacy: false, agreed_terms: false });
-
-  await sendIntroMessage(senderId);
-  await sendFreeFeaturesMessage(senderId);
-  await sendPremiumFeaturesMessage(senderId);
-  await sendConsentExplainer(senderId);
-  await sendPrivacyPolicyIntroduction(senderId);
-}
-
-// Onboarding message with consent (legacy)
-async function sendOnboardingMessage(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      text: "Hi! I'm Easely, your personal Canvas assistant. I help you manage your assignments and never miss a deadline.\n\nTo get started, I need your consent to access your Canvas data and send you reminders.",
-      quick_replies: [
-        {
-          content_type: "text",
-          title: "✅ I Agree, Let's Go!",
-          payload: "AGREE_TERMS"
-        },
-        {
-          content_type: "text",
-          title: "📜 Privacy Policy",
-          payload: "PRIVACY_POLICY"
-        },
-        {
-          content_type: "text",
-          title: "⚖️ Terms of Use",
-          payload: "TERMS_OF_USE"
-        }
-      ]
+      text: `Welcome back${userName}! 🎉\n\nUse the menu button (☰) below to access:\n📋 My Tasks - View your assignments\n🔧 Canvas Setup - Configure your connection\n❓ Help & Support - Get assistance\n🌟 Upgrade to Premium - Unlock all features\n\n📱 Android users: If you don't see the menu button, type 'menu' or use the quick options below.\n\nWhat would you like to do today?`,
+      // Quick access to the task views rides on the welcome itself
+      quick_replies: QUICK_ACCESS_REPLIES
     }
   };
   
   await sendMessage(message);
 }
 
-async function sendIntroMessage(senderId) {
-  const text = "Hi! I'm Easely, your personal Canvas assistant for Facebook Messenger. I turn your Canvas into a proactive, easy-to-manage experience so you never miss a deadline.";
-  await sendMessage({ recipient: { id: senderId }, message: { text } });
-}
-
-async function sendFreeFeaturesMessage(senderId) {
-  const text = "Easely (Free) includes:\n• Full Canvas sync (assignments and deadlines)\n• One reminder 24 hours before each due date\n• Add up to 5 manual tasks/month (synced to Canvas Calendar)\n• Quick filters: Due Today, This Week, Overdue, All Upcoming";
-  await sendMessage({ recipient: { id: senderId }, message: { text } });
-}
+// Onboarding intro, fused into a single message (well under Messenger's
+// 2000-character text limit) instead of one send per paragraph
+const ONBOARDING_INTRO_TEXT = [
+  "Hi! I'm Easely, your personal Canvas assistant for Facebook Messenger. I turn your Canvas into a proactive, easy-to-manage experience so you never miss a deadline.",
+  "Easely (Free) includes:\n• Full Canvas sync (assignments and deadlines)\n• One reminder 24 hours before each due date\n• Add up to 5 manual tasks/month (synced to Canvas Calendar)\n• Quick filters: Due Today, This Week, Overdue, All Upcoming",
+  "Easely Premium adds:\n• Proximity reminders: 1w, 3d, 1d, 8h, 2h, 1h\n• Unlimited manual tasks\n• AI-powered outline generation\n• Personalized weekly digest\n• Calendar export (Excel)",
+  "Before we continue, we need your consent to connect to your Canvas account and to send you reminders. Please review our Privacy Policy and Terms of Use."
+].join('\n\n');
 
-async function sendPremiumFeaturesMessage(senderId) {
-  const text = "Easely Premium adds:\n• Proximity reminders: 1w, 3d, 1d, 8h, 2h, 1h\n• Unlimited manual tasks\n• AI-powered outline generation\n• Personalized weekly digest\n• Calendar export (Excel)";
-  await sendMessage({ recipient: { id: senderId }, message: { text } });
-}
+// Lead-ins folded into the policy link templates during the consent flow
+const PRIVACY_POLICY_INTRO_TEXT = "🔒 To get started, please review our Privacy Policy to understand how we protect your data.";
+const TERMS_OF_USE_INTRO_TEXT = "⚖️ Next, please review our Terms of Use to understand your rights and responsibilities.";
 
-async function sendConsentExplainer(senderId) {
-  const text = "Before we continue, we need your consent to connect to your Canvas account and to send you reminders. Please review our Privacy Policy and Terms of Use.";
-  await sendMessage({ recipient: { id: senderId }, message: { text } });
-}
+// Start multi-step onboarding flow
+async function startOnboardingFlow(senderId) {
+  // Reset consent flags while the intro messages go out; the messages don't
+  // depend on the write, so the DB round trip overlaps the Graph calls
+  const resetConsent = updateUser(senderId, { agreed_privacy: false, agreed_terms: false });
 
-// New function to introduce privacy policy
-async function sendPrivacyPolicyIntroduction(senderId) {
-  const text = "🔒 To get started, please review our Privacy Policy to understand how we protect your data.";
-  await sendMessage({ recipient: { id: senderId }, message: { text } });
+  // Intro and privacy policy link go out in one batch request, still in order
+  await sendMessageBatch([
+    { recipient: { id: senderId }, message: { text: ONBOARDING_INTRO_TEXT } },
+    privacyPolicyLinkMessage(senderId, PRIVACY_POLICY_INTRO_TEXT)
+  ]);
+  schedulePrivacyConsentPrompt(senderId);
   
-  // After a brief moment, show the privacy policy link
-  setTimeout(async () => {
-    await sendPrivacyPolicyLink(senderId);
-  }, 2000);
+  await resetConsent;
 }
 
 async function sendPoliciesPrompt(senderId) {
   const text = "Open and review:";
-  const quick_replies = [
-    { content_type: "text", title: "📜 Privacy Policy", payload: "OPEN_PRIVACY_POLICY" },
-    { content_type: "text", title: "⚖️ Terms of Use", payload: "OPEN_TERMS_OF_USE" }
-  ];
-  await sendMessage({ recipient: { id: senderId }, message: { text, quick_replies } });
+  await sendMessage({ recipient: { id: senderId }, message: { text, quick_replies: POLICIES_PROMPT_REPLIES } });
 }
 
-async function sendPrivacyPolicyLink(senderId) {
-  const message = {
+// Button template linking to a policy page, optionally led by an intro line
+function policyLinkMessage(senderId, text, url, title, intro) {
+  return {
     recipient: { id: senderId },
     message: {
       attachment: {
         type: "template",
         payload: {
           template_type: "button",
-          text: "Tap to view our Privacy Policy:",
+          text: intro ? `${intro}\n\n${text}` : text,
           buttons: [
-            { type: "web_url", url: "https://easelyprivacypolicy.onrender.com", title: "Open Privacy Policy" }
+            { type: "web_url", url, title }
           ]
         }
       }
     }
   };
-  await sendMessage(message);
+}
+
+function privacyPolicyLinkMessage(senderId, intro) {
+  return policyLinkMessage(senderId, "Tap to view our Privacy Policy:", "https://easelyprivacypolicy.onrender.com", "Open Privacy Policy", intro);
+}
+
+function termsOfUseLinkMessage(senderId, intro) {
+  return policyLinkMessage(senderId, "Tap to view our Terms of Use:", "https://easelytermsofuse.onrender.com", "Open Terms of Use", intro);
+}
 
-  // After 5 seconds, ask for consent acknowledgement
-  setTimeout(async () => {
+// After 5 seconds, ask for consent acknowledgement
+function schedulePrivacyConsentPrompt(senderId) {
+  sendLater(5000, async () => {
     await sendMessage({
       recipient: { id: senderId },
       message: {
         text: "Do you agree to the Privacy Policy?",
-        quick_replies: [
-          { content_type: "text", title: "✅ I Agree", payload: "AGREE_PRIVACY" }
-        ]
+        quick_replies: AGREE_PRIVACY_REPLIES
       }
     });
-  }, 5000);
+  });
 }
 
-async function sendTermsOfUseLink(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      attachment: {
-        type: "template",
-        payload: {
-          template_type: "button",
-          text: "Tap to view our Terms of Use:",
-          buttons: [
-            { type: "web_url", url: "https://easelytermsofuse.onrender.com", title: "Open Terms of Use" }
-          ]
-        }
-      }
-    }
-  };
-  await sendMessage(message);
-
-  // After 5 seconds, ask for consent acknowledgement
-  setTimeout(async () => {
+function scheduleTermsConsentPrompt(senderId) {
+  sendLater(5000, async () => {
     await sendMessage({
       recipient: { id: senderId },
       message: {
         text: "Do you agree to the Terms of Use?",
-        quick_replies: [
-          { content_type: "text", title: "✅ I Agree", payload: "AGREE_TERMS_OF_USE" }
-        ]
+        quick_replies: AGREE_TERMS_OF_USE_REPLIES
       }
     });
-  }, 5000);
+  });
+}
+
+async function sendPrivacyPolicyLink(senderId, intro) {
+  await sendMessage(privacyPolicyLinkMessage(senderId, intro));
+  schedulePrivacyConsentPrompt(senderId);
+}
+
+async function sendTermsOfUseLink(senderId, intro) {
+  await sendMessage(termsOfUseLinkMessage(senderId, intro));
+  scheduleTermsConsentPrompt(senderId);
 }
 
 async function maybeFinishConsent(senderId) {
@@ -950,15 +932,9 @@ async function maybeFinishConsent(senderId) {
   // If neither agreed yet, wait for privacy agreement first
 }
 
-// New function to introduce terms of use
+// Terms of Use introduction, sent as the lead-in of the link template
 async function sendTermsOfUseIntroduction(senderId) {
-  const text = "⚖️ Next, please review our Terms of Use to understand your rights and responsibilities.";
-  await sendMessage({ recipient: { id: senderId }, message: { text } });
-  
-  // After a brief moment, show the terms link
-  setTimeout(async () => {
-    await sendTermsOfUseLink(senderId);
-  }, 2000);
+  await sendTermsOfUseLink(senderId, TERMS_OF_USE_INTRO_TEXT);
 }
 
 // New Canvas token request flow with better instructions
@@ -969,35 +945,13 @@ async function sendCanvasTokenRequest(senderId) {
     recipient: { id: senderId },
     message: {
       text: text,
-      quick_replies: [
-        {
-          content_type: "text",
-          title: "✅ Yes, I have it",
-          payload: "HAVE_TOKEN"
-        },
-        {
-          content_type: "text",
-          title: "📖 Show Instructions",
-          payload: "SHOW_TUTORIAL"
-        },
-        {
-          content_type: "text",
-          title: "🎥 Watch Video Tutorial",
-          payload: "SHOW_VIDEO_TUTORIAL"
-        }
-      ]
+      quick_replies: TOKEN_REQUEST_REPLIES
     }
   };
   
   await sendMessage(message);
 }
 
-// Legacy token request message - kept for backward compatibility
-async function sendTokenRequestMessage(senderId) {
-  // Redirect to new flow
-  await sendCanvasTokenRequest(senderId);
-}
-
 // Tutorial message with video link option
 async function sendTutorialMessage(senderId) {
   const message = {
@@ -1010,97 +964,95 @@ async function sendTutorialMessage(senderId) {
   await sendMessage(message);
   
   // After showing instructions, offer video help
-  setTimeout(async () => {
+  sendLater(3000, async () => {
     await sendMessage({
       recipient: { id: senderId },
       message: {
         text: "Need visual help? Watch our video tutorial:",
-        quick_replies: [
-          {
-            content_type: "text",
-            title: "🎥 Watch Video",
-            payload: "SHOW_VIDEO_TUTORIAL"
-          },
-          {
-            content_type: "text",
-            title: "✅ I got it!",
-            payload: "HAVE_TOKEN"
-          }
-        ]
+        quick_replies: TUTORIAL_FOLLOWUP_REPLIES
       }
     });
-  }, 3000);
+  });
 }
 
-// New function to send video tutorial link
-async function sendVideoTutorial(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      attachment: {
-        type: "template",
-        payload: {
-          template_type: "button",
-          text: "🎥 Watch this quick video tutorial on how to get your Canvas Access Token:",
-          buttons: [
-            { 
-              type: "web_url", 
-              url: "https://github.com/keanlouis30/EaselyBot/releases/tag/v1.0.0-video", 
-              title: "Open Video Tutorial" 
-            }
-          ]
-        }
+// The tutorial video is hosted on GitHub releases rather than uploaded, so
+// every send reuses this one link template
+const VIDEO_TUTORIAL_ATTACHMENT = {
+  type: "template",
+  payload: {
+    template_type: "button",
+    text: "🎥 Watch this quick video tutorial on how to get your Canvas Access Token:",
+    buttons: [
+      {
+        type: "web_url",
+        url: "https://github.com/keanlouis30/EaselyBot/releases/tag/v1.0.0-video",
+        title: "Open Video Tutorial"
       }
-    }
-  };
-  
-  await sendMessage(message);
+    ]
+  }
+};
+
+const VIDEO_TUTORIAL_MESSAGE_JSON = JSON.stringify({ attachment: VIDEO_TUTORIAL_ATTACHMENT });
+
+// New function to send video tutorial link
+async function sendVideoTutorial(senderId) {
+  await sendSerializedMessage(senderId, VIDEO_TUTORIAL_MESSAGE_JSON);
   
   // After showing video link, prompt for token
-  setTimeout(async () => {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: {
-        text: "After getting your token from Canvas, paste it here and I'll connect to your account!"
-      }
-    });
-  }, 3000);
+  sendLater(3000, async () => {
+    await sendTextMessage(senderId, "After getting your token from Canvas, paste it here and I'll connect to your account!");
+  });
 }
 
 // Canvas API integration functions
-async function validateCanvasToken(token) {
-  const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
+
+// Token validation results keyed by token hash: valid tokens are trusted for
+// 5 minutes, rejected ones for only 30 seconds so a corrected token (or a
+// Canvas hiccup) isn't stuck behind a stale failure. Capped so tokens from
+// users who never come back don't pile up.
+const TOKEN_VALID_TTL_MS = 5 * 60 * 1000;
+const TOKEN_INVALID_TTL_MS = 30 * 1000;
+const tokenValidationCache = new BoundedMap(10000);
+
+async function validateCanvasToken(token, { forceRefresh = false } = {}) {
+  const key = canvas.tokenHash(token);
+  const entry = tokenValidationCache.get(key);
+  if (!forceRefresh && entry && entry.expiresAt > Date.now()) {
+    return entry.result;
+  }
   
   try {
-    const response = await axios.get(`${canvasUrl}/api/v1/users/self`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-        'Content-Type': 'application/json'
-      },
+    const response = await canvas.canvasGet(token, '/users/self', {
       timeout: 10000
     });
     
-    return {
+    const result = {
       valid: true,
       user: response.data
     };
+    tokenValidationCache.set(key, { expiresAt: Date.now() + TOKEN_VALID_TTL_MS, result });
+    return result;
   } catch (error) {
     console.error('Canvas token validation failed:', error.response?.status, error.response?.data);
-    return {
+    const result = {
       valid: false,
       error: error.response?.data?.errors?.[0]?.message || 'Invalid token or network error'
     };
+    // Only remember real rejections of the token (401, or a 403 that isn't
+    // throttling); outages, rate limits and network errors aren't cached
+    const status = error.response?.status;
+    if (status === 401 || (status === 403 && !canvas.isRateLimited(error))) {
+      tokenValidationCache.set(key, { expiresAt: Date.now() + TOKEN_INVALID_TTL_MS, result });
+    }
+    return result;
   }
 }
 
 // Check Canvas token permissions for task creation
 async function checkCanvasPermissions(token) {
-  const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
-  
   try {
     // Test basic user access
-    const userResponse = await axios.get(`${canvasUrl}/api/v1/users/self`, {
-      headers: { 'Authorization': `Bearer ${token}` },
+    const userResponse = await canvas.canvasGet(token, '/users/self', {
       timeout: 10000
     });
     
@@ -1108,8 +1060,7 @@ async function checkCanvasPermissions(token) {
     
     // Test planner notes access
     try {
-      const plannerResponse = await axios.get(`${canvasUrl}/api/v1/planner_notes`, {
-        headers: { 'Authorization': `Bearer ${token}` },
+      const plannerResponse = await canvas.canvasGet(token, '/planner_notes', {
         params: { per_page: 1 },
         timeout: 10000
       });
@@ -1120,8 +1071,7 @@ async function checkCanvasPermissions(token) {
     
     // Test calendar events access
     try {
-      const calendarResponse = await axios.get(`${canvasUrl}/api/v1/calendar_events`, {
-        headers: { 'Authorization': `Bearer ${token}` },
+      const calendarResponse = await canvas.canvasGet(token, '/calendar_events', {
         params: { per_page: 1 },
         timeout: 10000
       });
@@ -1137,9 +1087,137 @@ async function checkCanvasPermissions(token) {
   }
 }
 
+// Task record shown in the task views, for Canvas assignments and manual
+// tasks alike. A class gives every record the same fixed set of fields (one
+// shape for V8), which keeps the long-lived cached assignment lists compact
+// and property access monomorphic.
+class Assignment {
+  constructor({
+    id, title, dueDate, course, courseId,
+    htmlUrl = null, pointsPossible = null, submissionTypes = null, hasSubmitted = false,
+    description = null, isManual = false, canvasType = null
+  }) {
+    this.id = id;
+    this.title = title;
+    this.dueDate = dueDate;
+    this.course = course;
+    this.courseId = courseId;
+    this.htmlUrl = htmlUrl;
+    this.pointsPossible = pointsPossible;
+    this.submissionTypes = submissionTypes;
+    this.hasSubmitted = hasSubmitted;
+    this.description = description;
+    this.isManual = isManual;
+    this.canvasType = canvasType;
+  }
+  
+  // Build from a Canvas assignment object
+  static fromCanvas(assignment, dueDate, courseId, courseName) {
+    return new Assignment({
+      id: assignment.id,
+      title: assignment.name,
+      dueDate,
+      course: courseName,
+      courseId,
+      htmlUrl: assignment.html_url,
+      pointsPossible: assignment.points_possible,
+      submissionTypes: assignment.submission_types,
+      hasSubmitted: assignment.has_submitted_submissions
+    });
+  }
+  
+  // Build from a manual task row in the database
+  static fromDatabase(dbTask) {
+    return new Assignment({
+      id: dbTask.canvas_id || dbTask.id,
+      title: dbTask.title,
+      dueDate: new Date(dbTask.due_date),
+      course: dbTask.course_name,
+      courseId: dbTask.canvas_course_id,
+      description: dbTask.description,
+      isManual: true,
+      canvasType: dbTask.canvas_type
+    });
+  }
+}
+
+// Fetch each course's assignments concurrently, a few at a time so a long
+// course list doesn't burst past Canvas's rate limit. Returns one list per
+// course (in course order); a course that fails is logged and left empty.
+async function fetchAssignmentsPerCourse(token, courses, { dueBefore, bucket }) {
+  return canvas.mapWithConcurrency(courses, canvas.MAX_CONCURRENT_REQUESTS, async (course) => {
+    try {
+      return await canvas.getCourseAssignments(token, course.id, { dueBefore, bucket });
+    } catch (assignmentError) {
+      console.warn(`Failed to fetch assignments for course ${course.name}:`, assignmentError.message);
+      return [];
+    }
+  });
+}
+
+// Shared comparators for earliest-/latest-due-first ordering
+function byDueDate(a, b) {
+  return a.dueDate - b.dueDate;
+}
+
+function byDueDateDesc(a, b) {
+  return b.dueDate - a.dueDate;
+}
+
+// Merge lists that are each sorted under `compare` into one sorted list,
+// pairing them up round by round (O(n log k) for k lists); stable
+function mergeSorted(lists, compare) {
+  let runs = lists.filter(list => list.length > 0);
+  if (runs.length === 0) return [];
+  
+  while (runs.length > 1) {
+    const merged = [];
+    for (let r = 0; r < runs.length; r += 2) {
+      const left = runs[r];
+      const right = runs[r + 1];
+      if (!right) {
+        merged.push(left);
+        continue;
+      }
+      
+      const out = [];
+      let i = 0;
+      let j = 0;
+      while (i < left.length && j < right.length) {
+        out.push(compare(right[j], left[i]) < 0 ? right[j++] : left[i++]);
+      }
+      while (i < left.length) out.push(left[i++]);
+      while (j < right.length) out.push(right[j++]);
+      merged.push(out);
+    }
+    runs = merged;
+  }
+  return runs[0];
+}
+
+// Return the first k items of `items` under `compare`, in order, without
+// sorting the whole list: keeps a sorted buffer of at most k entries
+function selectTop(items, k, compare) {
+  const top = [];
+  for (const item of items) {
+    if (top.length === k && compare(item, top[k - 1]) >= 0) continue;
+    
+    // Binary search for the insertion point within the buffer
+    let lo = 0;
+    let hi = top.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (compare(item, top[mid]) < 0) hi = mid;
+      else lo = mid + 1;
+    }
+    top.splice(lo, 0, item);
+    if (top.length > k) top.pop();
+  }
+  return top;
+}
+
 async function fetchCanvasAssignments(token, options = {}) {
-  const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
-  const { daysAhead = 30, includeOverdue = true } = options;
+  const { daysAhead = 30, includeOverdue = true, bucket = 'upcoming' } = options;
   
   try {
     // Calculate date range for filtering (to reduce API calls)
@@ -1149,90 +1227,108 @@ async function fetchCanvasAssignments(token, options = {}) {
     const futureDate = new Date(nowManila);
     futureDate.setDate(futureDate.getDate() + daysAhead);
     
-    // Get all active courses with rate limit awareness
-    const coursesResponse = await axios.get(`${canvasUrl}/api/v1/courses`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-        'Content-Type': 'application/json'
-      },
-      params: {
-        enrollment_state: 'active',
-        per_page: 50 // Reduced from 100 to be more conservative
-      },
-      timeout: 15000
-    });
+    const courseMap = {};
+    
+    // Canvas emits due_at as fixed-format UTC ('2025-01-31T15:59:00Z'), so the
+    // window check is a plain string comparison against bounds formatted the
+    // same way; only in-window items are parsed into a Date
+    const toCanvasIso = date => date.toISOString().replace(/\.\d{3}Z$/, 'Z');
+    const cutoffIso = toCanvasIso(cutoffDate);
+    const futureIso = toCanvasIso(futureDate);
+    
+    // Single pass over the Canvas payload: skip anything outside the window
+    // and project only the fields the bot uses; the HTML description is left
+    // out. Lists ordered by due_at stop at the first item past the window.
+    const collectInRange = (assignments, courseId, out, sortedByDue = false) => {
+      for (const assignment of assignments) {
+        const dueAt = assignment.due_at;
+        if (!dueAt || dueAt < cutoffIso) continue;
+        if (dueAt > futureIso) {
+          if (sortedByDue) break;
+          continue;
+        }
+        
+        const id = courseId ?? assignment.course_id;
+        out.push(Assignment.fromCanvas(assignment, new Date(dueAt), id, courseMap[id] ?? assignment.course_name));
+      }
+      return out;
+    };
     
-    const courses = coursesResponse.data;
-    console.log(`Found ${courses.length} active courses`);
+    // Each entry is a list already ordered by due date
+    let sortedLists = null;
     
-    // Fetch assignments for each course with rate limiting
-    const allAssignments = [];
-    const courseMap = {};
+    if (canvas.GRAPHQL_ENABLED) {
+      // One GraphQL request for every course's assignments (plus follow-up
+      // pages for very large courses), when enabled
+      try {
+        const graphqlAssignments = await canvas.getAssignmentsGraphQL(token);
+        graphqlAssignments.forEach(item => {
+          courseMap[item.course_id] = item.course_name;
+        });
+        // GraphQL returns every assignment; apply the bucket=upcoming cut here
+        const now = new Date();
+        const inWindow = collectInRange(graphqlAssignments, null, [])
+          .filter(assignment => bucket !== 'upcoming' || assignment.dueDate >= now);
+        sortedLists = [inWindow.sort(byDueDate)];
+      } catch (graphqlError) {
+        console.warn('Canvas GraphQL fetch failed, falling back to REST:', graphqlError.response?.status || graphqlError.message);
+      }
+    }
     
-    // Process courses in batches to avoid rate limiting
-    const batchSize = 3;
-    for (let i = 0; i < courses.length; i += batchSize) {
-      const courseBatch = courses.slice(i, i + batchSize);
-      
-      await Promise.all(courseBatch.map(async (course) => {
+    if (!sortedLists && bucket === 'upcoming') {
+      // Planner items are already filtered to the date window server-side and
+      // span every course in one paginated call, so no course list is needed
+      try {
+        const plannerAssignments = await canvas.getPlannerAssignments(token, {
+          startDate: new Date(),
+          endDate: futureDate
+        });
+        plannerAssignments.forEach(item => {
+          courseMap[item.course_id] = item.course_name;
+        });
+        sortedLists = [collectInRange(plannerAssignments, null, []).sort(byDueDate)];
+      } catch (plannerError) {
+        console.warn('Planner items fetch failed, falling back to course requests:', plannerError.response?.status || plannerError.message);
+      }
+    }
+    
+    if (!sortedLists) {
+      // Get all active courses (served from cache when fresh)
+      const courses = await canvas.getUserCourses(token);
+      console.log(`Found ${courses.length} active courses`);
+      courses.forEach(course => {
         courseMap[course.id] = course.name;
-        
-        try {
-          const assignmentsResponse = await axios.get(`${canvasUrl}/api/v1/courses/${course.id}/assignments`, {
-            headers: {
-              'Authorization': `Bearer ${token}`,
-              'Content-Type': 'application/json'
-            },
-            params: {
-              per_page: 50,
-              order_by: 'due_at',
-              bucket: 'upcoming' // Only get upcoming assignments to reduce load
-            },
-            timeout: 10000
-          });
-          
-          const courseAssignments = assignmentsResponse.data
-            .filter(assignment => {
-              if (!assignment.due_at) return false;
-              const dueDate = new Date(assignment.due_at);
-              // Filter out assignments outside our date range
-              return dueDate >= cutoffDate && dueDate <= futureDate;
-            })
-            .map(assignment => ({
-              id: assignment.id,
-              title: assignment.name,
-              dueDate: new Date(assignment.due_at),
-              course: course.name,
-              courseId: course.id,
-              description: assignment.description,
-              htmlUrl: assignment.html_url,
-              pointsPossible: assignment.points_possible,
-              submissionTypes: assignment.submission_types,
-              hasSubmitted: assignment.has_submitted_submissions
-            }));
-            
-          allAssignments.push(...courseAssignments);
-          
-        } catch (assignmentError) {
-          console.warn(`Failed to fetch assignments for course ${course.name}:`, assignmentError.message);
-        }
-      }));
+      });
       
-      // Add delay between batches to respect rate limits
-      if (i + batchSize < courses.length) {
-        await new Promise(resolve => setTimeout(resolve, 1000));
+      try {
+        // One calendar_events request per 10 courses instead of one per course;
+        // start at now to match the per-course bucket=upcoming results
+        const bulkAssignments = await canvas.getUpcomingAssignmentsBulk(token, courses.map(c => c.id), {
+          startDate: bucket === 'upcoming' ? new Date() : cutoffDate,
+          endDate: futureDate
+        });
+        
+        // Calendar groups come back as separate runs, so order them once here
+        sortedLists = [collectInRange(bulkAssignments, null, []).sort(byDueDate)];
+        
+      } catch (bulkError) {
+        console.warn('Bulk calendar fetch failed, falling back to per-course requests:', bulkError.response?.status || bulkError.message);
+        
+        // Canvas returns each course ordered by due_at (order_by=due_at)
+        const perCourse = await fetchAssignmentsPerCourse(token, courses, { dueBefore: futureDate, bucket });
+        sortedLists = courses.map((course, i) => collectInRange(perCourse[i], course.id, [], true));
       }
     }
     
-    // Filter out assignments more than 300 days overdue
+    // Merge the per-course runs instead of re-sorting the combined list
+    const allAssignments = mergeSorted(sortedLists, byDueDate);
+    
+    // Filter out assignments more than 300 days overdue (keeps the order)
     const filteredAssignments = allAssignments.filter(assignment => {
       const daysDiff = (nowManila - assignment.dueDate) / (1000 * 60 * 60 * 24);
       return daysDiff < 300; // Keep assignments less than 300 days overdue
     });
     
-    // Sort by due date
-    filteredAssignments.sort((a, b) => a.dueDate - b.dueDate);
-    
     console.log(`Fetched ${filteredAssignments.length} assignments (filtered from ${allAssignments.length})`);
     
     return {
@@ -1246,86 +1342,47 @@ async function fetchCanvasAssignments(token, options = {}) {
   }
 }
 
-function formatDueDate(date) {
-  // Convert to Manila timezone
-  const manilaTimeOptions = { timeZone: 'Asia/Manila' };
-  const now = new Date();
-  const nowManila = new Date(now.toLocaleString('en-US', manilaTimeOptions));
-  const dueDateManila = new Date(date.toLocaleString('en-US', manilaTimeOptions));
-  
-  const diffMs = dueDateManila.getTime() - nowManila.getTime();
-  const diffDays = Math.ceil(diffMs / (1000 * 60 * 60 * 24));
-  
-  const timeFormatOptions = {
-    timeZone: 'Asia/Manila',
-    hour: 'numeric',
-    minute: '2-digit',
-    hour12: true
-  };
-  
-  const dateTimeFormatOptions = {
-    timeZone: 'Asia/Manila',
-    weekday: 'long',
-    hour: 'numeric',
-    minute: '2-digit',
-    hour12: true
-  };
-  
-  const fullDateFormatOptions = {
-    timeZone: 'Asia/Manila',
-    month: 'short',
-    day: 'numeric',
-    hour: 'numeric',
-    minute: '2-digit',
-    hour12: true
-  };
-  
-  if (diffDays === 0) {
-    return `Today ${date.toLocaleTimeString('en-US', timeFormatOptions)}`;
-  } else if (diffDays === 1) {
-    return `Tomorrow ${date.toLocaleTimeString('en-US', timeFormatOptions)}`;
-  } else if (diffDays < 7 && diffDays > 0) {
-    return date.toLocaleString('en-US', dateTimeFormatOptions);
-  } else {
-    return date.toLocaleString('en-US', fullDateFormatOptions);
-  }
+// Assignments for the task views: served from cache for 2 minutes, then
+// returned stale (up to 15 minutes) while a background refresh runs
+async function getCanvasAssignments(token) {
+  return canvas.fetchWithSWR(
+    `${canvas.tokenHash(token)}:assignments-view`,
+    2 * 60 * 1000,
+    15 * 60 * 1000,
+    () => fetchCanvasAssignments(token)
+  );
+}
+
+// Fire-and-forget prefetch of the task-view data for a newly connected token
+function warmCanvasCache(token) {
+  getCanvasAssignments(token).catch(error => {
+    console.warn('Canvas cache warm-up failed:', error.message);
+  });
 }
 
 // Handle Canvas token submission - Only validate and store token
 async function handleCanvasToken(senderId, token) {
-  // Send initial loading message
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: "🔄 Validating your Canvas token..." }
-  });
-  
   try {
-    // Validate the token first
-    const validation = await validateCanvasToken(token);
+    // Send the loading message while Canvas checks the token; the result
+    // replies below go out only after both have finished
+    const [, validation] = await Promise.all([
+      sendTextMessage(senderId, "🔄 Validating your Canvas token..."),
+      validateCanvasToken(token)
+    ]);
     
     if (!validation.valid) {
       await sendMessage({
         recipient: { id: senderId },
         message: {
           text: `❌ Canvas token validation failed: ${validation.error}\n\nPlease check your token and try again. Make sure you've enabled the correct permissions:\n\n- Read assignments\n- Read courses\n- Read user data\n\nClick '❓ Show me how' to see the setup tutorial again.`,
-          quick_replies: [
-            {
-              content_type: "text",
-              title: "❓ Show me how",
-              payload: "SHOW_TUTORIAL"
-            },
-            {
-              content_type: "text",
-              title: "🔄 Try Again",
-              payload: "HAVE_TOKEN"
-            }
-          ]
+          quick_replies: TOKEN_INVALID_REPLIES
         }
       });
       return;
     }
     
     // Token is valid, store it without fetching all assignments
+    canvas.invalidate(token);
     await updateUser(senderId, {
       canvas_token: token,
       is_onboarded: true,
@@ -1333,18 +1390,17 @@ async function handleCanvasToken(senderId, token) {
       canvas_user_id: validation.user.id
     });
     
+    // Start loading courses and assignments in the background so the user's
+    // first task view is served from cache
+    warmCanvasCache(token);
+    
     // Send success message without listing assignments
     const successMessage = `🎉 Successfully connected as ${validation.user.name}!\n\nI'm now connected to your Canvas account. I'll fetch your assignments when you need them to avoid overwhelming the system.\n\nWhat would you like to see?`;
     
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: successMessage }
-    });
+    await sendTextMessage(senderId, successMessage);
     
-    // After a moment, show the main menu
-    setTimeout(async () => {
-      await sendWelcomeMessage(senderId);
-    }, 2000);
+    // Then show the main menu
+    await sendWelcomeMessage(senderId);
     
   } catch (error) {
     console.error('Canvas token validation error:', error);
@@ -1353,56 +1409,89 @@ async function handleCanvasToken(senderId, token) {
       recipient: { id: senderId },
       message: {
         text: `❌ Sorry, I couldn't validate your Canvas token: ${error.message}\n\nThis might be due to:\n- Network connectivity issues\n- Canvas server being temporarily unavailable\n- Invalid token\n\nPlease try again in a few minutes.`,
-        quick_replies: [
-          {
-            content_type: "text",
-            title: "🔄 Try Again",
-            payload: "HAVE_TOKEN"
-          },
-          {
-            content_type: "text",
-            title: "❓ Show Tutorial",
-            payload: "SHOW_TUTORIAL"
-          }
-        ]
+        quick_replies: TOKEN_ERROR_REPLIES
       }
     });
   }
 }
 
+// Static quick-reply sets for the task pickers and submenus
+
+// Task due date picker
+const TASK_DATE_REPLIES = [
+  { content_type: "text", title: "📅 Today", payload: "TASK_DATE_TODAY" },
+  { content_type: "text", title: "📅 Tomorrow", payload: "TASK_DATE_TOMORROW" },
+  { content_type: "text", title: "📅 Friday", payload: "TASK_DATE_FRIDAY" },
+  { content_type: "text", title: "📅 Next Monday", payload: "TASK_DATE_NEXT_MONDAY" }
+];
+
+// Task due time picker
+const TASK_TIME_REPLIES = [
+  { content_type: "text", title: "🌅 8:00 AM", payload: "TASK_TIME_8AM" },
+  { content_type: "text", title: "☀️ 12:00 PM", payload: "TASK_TIME_12PM" },
+  { content_type: "text", title: "🌆 5:00 PM", payload: "TASK_TIME_5PM" },
+  { content_type: "text", title: "🌙 8:00 PM", payload: "TASK_TIME_8PM" },
+  { content_type: "text", title: "⏰ 11:59 PM", payload: "TASK_TIME_11_59PM" }
+];
+
+// My Tasks submenu
+const MY_TASKS_REPLIES = [
+  { content_type: "text", title: "🔥 Due Today", payload: "GET_TASKS_TODAY" },
+  { content_type: "text", title: "⏰ Due This Week", payload: "GET_TASKS_WEEK" },
+  { content_type: "text", title: "❗️ Show Overdue", payload: "SHOW_OVERDUE" },
+  { content_type: "text", title: "🗓 View All Upcoming", payload: "VIEW_ALL_UPCOMING" },
+  { content_type: "text", title: "➕ Add New Task", payload: "ADD_NEW_TASK" }
+];
+
+// Canvas Setup options once a token is connected
+const CANVAS_CONNECTED_REPLIES = [
+  { content_type: "text", title: "🔄 Reconnect Canvas", payload: "SHOW_TUTORIAL" },
+  { content_type: "text", title: "🧪 Test Connection", payload: "TEST_CANVAS_CONNECTION" },
+  { content_type: "text", title: "🔍 Check Recent Tasks", payload: "VIEW_RECENT_TASKS" },
+  { content_type: "text", title: "📋 View My Tasks", payload: "MY_TASKS" }
+];
+
+// Help & Support submenu
+const HELP_REPLIES = [
+  { content_type: "text", title: "🔧 Canvas Setup Help", payload: "CANVAS_SETUP" },
+  { content_type: "text", title: "📖 How to Use Easely", payload: "HOW_TO_USE" },
+  { content_type: "text", title: "🐛 Report a Problem", payload: "REPORT_PROBLEM" },
+  { content_type: "text", title: "💡 Feature Request", payload: "FEATURE_REQUEST" },
+  { content_type: "text", title: "📞 Contact Support", payload: "CONTACT_SUPPORT" }
+];
+
+// Fixed options appended after the user's courses in the course picker
+const COURSE_PICKER_EXTRA_REPLIES = [
+  { content_type: "text", title: "📁 Personal", payload: "SELECT_COURSE_PERSONAL" },
+  { content_type: "text", title: "✏️ Other Course", payload: "SELECT_COURSE_OTHER" }
+];
+
+// Static pickers and menus, serialized once; only the recipient varies
+const TASK_DATE_REQUEST_JSON = JSON.stringify({
+  text: "When is this task due? First, choose the date using the buttons:",
+  quick_replies: TASK_DATE_REPLIES
+});
+const TASK_TIME_REQUEST_JSON = JSON.stringify({
+  text: "Great! Now choose the time using the buttons:",
+  quick_replies: TASK_TIME_REPLIES
+});
+const MY_TASKS_MESSAGE_JSON = JSON.stringify({
+  text: "📋 My Tasks - What would you like to see?",
+  quick_replies: MY_TASKS_REPLIES
+});
+const HELP_AND_SUPPORT_MESSAGE_JSON = JSON.stringify({
+  text: "❓ Help & Support\n\nI'm here to help! What do you need assistance with?",
+  quick_replies: HELP_REPLIES
+});
+
 // Task management functions - Date selection
 async function sendTaskDateRequest(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      text: "When is this task due? First, choose the date using the buttons:",
-      quick_replies: [
-        { content_type: "text", title: "📅 Today", payload: "TASK_DATE_TODAY" },
-        { content_type: "text", title: "📅 Tomorrow", payload: "TASK_DATE_TOMORROW" },
-        { content_type: "text", title: "📅 Friday", payload: "TASK_DATE_FRIDAY" },
-        { content_type: "text", title: "📅 Next Monday", payload: "TASK_DATE_NEXT_MONDAY" }
-      ]
-    }
-  };
-  await sendMessage(message);
+  await sendSerializedMessage(senderId, TASK_DATE_REQUEST_JSON);
 }
 
 // Task management functions - Time selection
 async function sendTaskTimeRequest(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      text: "Great! Now choose the time using the buttons:",
-      quick_replies: [
-        { content_type: "text", title: "🌅 8:00 AM", payload: "TASK_TIME_8AM" },
-        { content_type: "text", title: "☀️ 12:00 PM", payload: "TASK_TIME_12PM" },
-        { content_type: "text", title: "🌆 5:00 PM", payload: "TASK_TIME_5PM" },
-        { content_type: "text", title: "🌙 8:00 PM", payload: "TASK_TIME_8PM" },
-        { content_type: "text", title: "⏰ 11:59 PM", payload: "TASK_TIME_11_59PM" }
-      ]
-    }
-  };
-  await sendMessage(message);
+  await sendSerializedMessage(senderId, TASK_TIME_REQUEST_JSON);
 }
 
 // Legacy function - replaced by db.createTask() in database service
@@ -1418,17 +1507,13 @@ async function createCanvasPlannerNote(senderId, { title, description, dueDate,
     return null; // Fail silently, let the calling function handle the fallback
   }
   
-  const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
   const whenText = formatDateTimeManila(dueDate);
   const courseLabel = courseId ? (courseName || 'Selected Course') : 'Personal';
   
-  console.log(`🌐 Canvas URL: ${canvasUrl}, Course: ${courseLabel}`);
+  console.log(`🌐 Canvas URL: ${canvas.CANVAS_BASE_URL}, Course: ${courseLabel}`);
   
   // Send loading message first
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: `🔄 Creating task in Canvas dashboard...` }
-  });
+  await sendTextMessage(senderId, `🔄 Creating task in Canvas dashboard...`);
   
   try {
     // Try creating as Planner Note first
@@ -1441,22 +1526,13 @@ async function createCanvasPlannerNote(senderId, { title, description, dueDate,
     
     console.log('📋 Creating Canvas Planner Note with body:', plannerBody);
     
-    const plannerResponse = await axios.post(`${canvasUrl}/api/v1/planner_notes`, plannerBody, {
-      headers: {
-        'Authorization': `Bearer ${user.canvas_token}`,
-        'Content-Type': 'application/json'
-      },
+    const plannerResponse = await canvas.canvasPost(user.canvas_token, '/planner_notes', plannerBody, {
       timeout: 15000
     });
     
     console.log('✅ Planner Note created successfully:', plannerResponse.data);
     
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { 
-          text: `✅ Task created in Canvas Planner!\n\n📝 "${title}"\n📚 ${courseLabel}\n⏰ Due: ${whenText}\n\n💡 It should appear on your Canvas Dashboard > To-Do list and in Planner. If you don't see it, refresh your Dashboard or pull-to-refresh on mobile.` 
-        }
-      });
+      await sendTextMessage(senderId, `✅ Task created in Canvas Planner!\n\n📝 "${title}"\n📚 ${courseLabel}\n⏰ Due: ${whenText}\n\n💡 It should appear on your Canvas Dashboard > To-Do list and in Planner. If you don't see it, refresh your Dashboard or pull-to-refresh on mobile.`);
     
     // Return task data for local storage
     return {
@@ -1505,22 +1581,13 @@ async function createCanvasPlannerNote(senderId, { title, description, dueDate,
       
       console.log('Creating Canvas Calendar Event as fallback:', eventBody);
       
-      const eventResponse = await axios.post(`${canvasUrl}/api/v1/calendar_events`, eventBody, {
-        headers: {
-          'Authorization': `Bearer ${user.canvas_token}`,
-          'Content-Type': 'application/json'
-        },
+      const eventResponse = await canvas.canvasPost(user.canvas_token, '/calendar_events', eventBody, {
         timeout: 15000
       });
       
       console.log('Calendar Event created successfully:', eventResponse.data);
       
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { 
-          text: `✅ Task created as Canvas Calendar Event!\n\n📝 "${title}"\n📚 ${courseLabel}\n⏰ Due: ${whenText}\n\nℹ️ Note: Calendar events do not show in the Dashboard To-Do list. They appear only in the Calendar view. If you want it on the To-Do list, ensure your token allows creating Planner Notes.` 
-        }
-      });
+      await sendTextMessage(senderId, `✅ Task created as Canvas Calendar Event!\n\n📝 "${title}"\n📚 ${courseLabel}\n⏰ Due: ${whenText}\n\nℹ️ Note: Calendar events do not show in the Dashboard To-Do list. They appear only in the Calendar view. If you want it on the To-Do list, ensure your token allows creating Planner Notes.`);
       
       // Return task data for local storage
       return {
@@ -1554,22 +1621,13 @@ async function createCanvasPlannerNote(senderId, { title, description, dueDate,
           
           console.log('Creating Canvas Assignment as final fallback:', assignmentBody);
           
-          const assignmentResponse = await axios.post(`${canvasUrl}/api/v1/courses/${courseId}/assignments`, assignmentBody, {
-            headers: {
-              'Authorization': `Bearer ${user.canvas_token}`,
-              'Content-Type': 'application/json'
-            },
+          const assignmentResponse = await canvas.canvasPost(user.canvas_token, `/courses/${courseId}/assignments`, assignmentBody, {
             timeout: 15000
           });
           
           console.log('Assignment created successfully:', assignmentResponse.data);
           
-          await sendMessage({
-            recipient: { id: senderId },
-            message: { 
-              text: `✅ Task created as unpublished Canvas Assignment!\n\n📝 "${title}"\n📚 ${courseLabel}\n⏰ Due: ${whenText}\n\n💡 Check your course assignments or gradebook to see the task.` 
-            }
-          });
+          await sendTextMessage(senderId, `✅ Task created as unpublished Canvas Assignment!\n\n📝 "${title}"\n📚 ${courseLabel}\n⏰ Due: ${whenText}\n\n💡 Check your course assignments or gradebook to see the task.`);
           
           // Return task data for local storage
           return {
@@ -1602,13 +1660,11 @@ async function createCanvasPlannerNote(senderId, { title, description, dueDate,
 async function fetchRecentPlannerNotes(senderId, { perPage = 5 } = {}) {
   const user = await getUser(senderId);
   if (!user || !user.canvas_token) {
-    await sendMessage({ recipient: { id: senderId }, message: { text: '❌ No Canvas token found. Please set up Canvas first from the menu: Canvas Setup.' } });
+    await sendTextMessage(senderId, '❌ No Canvas token found. Please set up Canvas first from the menu: Canvas Setup.');
     return [];
   }
-  const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
   try {
-    const resp = await axios.get(`${canvasUrl}/api/v1/planner_notes`, {
-      headers: { 'Authorization': `Bearer ${user.canvas_token}` },
+    const resp = await canvas.canvasGet(user.canvas_token, '/planner_notes', {
       params: { per_page: perPage },
       timeout: 10000
     });
@@ -1621,36 +1677,30 @@ async function fetchRecentPlannerNotes(senderId, { perPage = 5 } = {}) {
 
 // Simple command to test Planner Notes visibility
 async function testPlannerNotesVisibility(senderId) {
-  await sendMessage({ recipient: { id: senderId }, message: { text: '🔍 Fetching your recent Canvas Planner To-Dos…' } });
+  await sendTextMessage(senderId, '🔍 Fetching your recent Canvas Planner To-Dos…');
   const notes = await fetchRecentPlannerNotes(senderId, { perPage: 5 });
   if (!notes.length) {
-    await sendMessage({ recipient: { id: senderId }, message: { text: '❌ I could not read any Planner Notes. Your Canvas token or institution might not allow Planner Notes API. Tasks will only show on Calendar in this case.' } });
+    await sendTextMessage(senderId, '❌ I could not read any Planner Notes. Your Canvas token or institution might not allow Planner Notes API. Tasks will only show on Calendar in this case.');
     return;
   }
-  await sendMessage({ recipient: { id: senderId }, message: { text: `✅ Found ${notes.length} recent Planner To-Dos. Here are the latest:` } });
+  const replies = [`✅ Found ${notes.length} recent Planner To-Dos. Here are the latest:`];
   for (const n of notes) {
     const when = n.todo_date ? new Date(n.todo_date) : null;
     const whenText = when ? formatDateTimeManila(when) : '(no date)';
-    await sendMessage({ recipient: { id: senderId }, message: { text: `• ${n.title || '(no title)'}\n⏰ ${whenText}` } });
-    await new Promise(r => setTimeout(r, 300));
+    replies.push(`• ${n.title || '(no title)'}\n⏰ ${whenText}`);
   }
+  await sendTextBatch(senderId, replies);
 }
 
 // View recently created tasks from both local database and Canvas
 async function viewRecentCreatedTasks(senderId) {
   const user = await getUser(senderId);
   if (!user || !user.canvas_token) {
-    await sendMessage({ 
-      recipient: { id: senderId }, 
-      message: { text: '❌ No Canvas token found. Please set up Canvas first from the menu: Canvas Setup.' } 
-    });
+    await sendTextMessage(senderId, '❌ No Canvas token found. Please set up Canvas first from the menu: Canvas Setup.');
     return;
   }
 
-  await sendMessage({ 
-    recipient: { id: senderId }, 
-    message: { text: '📋 Checking your recently created tasks...' } 
-  });
+  await sendTextMessage(senderId, '📋 Checking your recently created tasks...');
 
   try {
     // Get tasks from local database
@@ -1660,70 +1710,44 @@ async function viewRecentCreatedTasks(senderId) {
     // Get planner notes from Canvas
     const plannerNotes = await fetchRecentPlannerNotes(senderId, { perPage: 10 });
     
+    // Collect the report and send it as one ordered batch
+    const replies = [];
+    
     // Summary message
-    await sendMessage({ 
-      recipient: { id: senderId }, 
-      message: { 
-        text: `📊 Task Summary:\n\n🗄️ Tasks in local database: ${manualTasks.length}\n📱 Tasks in Canvas Dashboard: ${plannerNotes.length}\n\nHere are your recent tasks:` 
-      } 
-    });
+    replies.push(`📊 Task Summary:\n\n🗄️ Tasks in local database: ${manualTasks.length}\n📱 Tasks in Canvas Dashboard: ${plannerNotes.length}\n\nHere are your recent tasks:`);
 
     // Display manual tasks from database
     if (manualTasks.length > 0) {
-      await sendMessage({ 
-        recipient: { id: senderId }, 
-        message: { text: '🗄️ **Tasks stored locally:**' } 
-      });
+      replies.push('🗄️ **Tasks stored locally:**');
       
       for (const task of manualTasks.slice(0, 5)) {
         const whenText = task.due_date ? formatDateTimeManila(new Date(task.due_date)) : 'No due date';
         const canvasInfo = task.canvas_type ? `(${task.canvas_type} in Canvas)` : '(Local only)';
-        await sendMessage({ 
-          recipient: { id: senderId }, 
-          message: { 
-            text: `• ${task.title}\n  📚 ${task.course_name}\n  ⏰ ${whenText}\n  💾 ${canvasInfo}` 
-          } 
-        });
-        await new Promise(r => setTimeout(r, 300));
+        replies.push(`• ${task.title}\n  📚 ${task.course_name}\n  ⏰ ${whenText}\n  💾 ${canvasInfo}`);
       }
     }
 
     // Display Canvas planner notes
     if (plannerNotes.length > 0) {
-      await sendMessage({ 
-        recipient: { id: senderId }, 
-        message: { text: '\n📱 **Tasks visible in Canvas Dashboard To-Do list:**' } 
-      });
+      replies.push('\n📱 **Tasks visible in Canvas Dashboard To-Do list:**');
       
       for (const note of plannerNotes.slice(0, 5)) {
         const when = note.todo_date ? new Date(note.todo_date) : null;
         const whenText = when ? formatDateTimeManila(when) : '(no date)';
         const courseInfo = note.course_id ? `Course ID: ${note.course_id}` : 'Personal';
-        await sendMessage({ 
-          recipient: { id: senderId }, 
-          message: { 
-            text: `• ${note.title}\n  📚 ${courseInfo}\n  ⏰ ${whenText}` 
-          } 
-        });
-        await new Promise(r => setTimeout(r, 300));
+        replies.push(`• ${note.title}\n  📚 ${courseInfo}\n  ⏰ ${whenText}`);
       }
     }
 
     // Help text if tasks are not syncing
     if (manualTasks.length > 0 && plannerNotes.length === 0) {
-      await sendMessage({ 
-        recipient: { id: senderId }, 
-        message: { 
-          text: `⚠️ Your tasks are stored locally but not showing in Canvas Dashboard.\n\nThis could mean:\n• Your Canvas token doesn't have Planner Notes permission\n• Tasks were created as Calendar Events (check Canvas Calendar)\n• Canvas sync is delayed\n\nTry refreshing your Canvas Dashboard or pulling-to-refresh on mobile.` 
-        } 
-      });
+      replies.push(`⚠️ Your tasks are stored locally but not showing in Canvas Dashboard.\n\nThis could mean:\n• Your Canvas token doesn't have Planner Notes permission\n• Tasks were created as Calendar Events (check Canvas Calendar)\n• Canvas sync is delayed\n\nTry refreshing your Canvas Dashboard or pulling-to-refresh on mobile.`);
     }
+    
+    await sendTextBatch(senderId, replies);
   } catch (error) {
     console.error('Error viewing recent tasks:', error);
-    await sendMessage({ 
-      recipient: { id: senderId }, 
-      message: { text: '❌ Error fetching task information. Please try again later.' } 
-    });
+    await sendTextMessage(senderId, '❌ Error fetching task information. Please try again later.');
   }
 }
 
@@ -1735,39 +1759,18 @@ async function sendCanvasCreationFailure(senderId, title, courseLabel, whenText,
   
   console.error('All Canvas creation methods failed. Error details:', errorDetails);
   
-  await sendMessage({ 
-    recipient: { id: senderId }, 
-    message: { 
-      text: `❌ Could not create task in Canvas Dashboard.\n\n📝 Task: "${title}"\n📚 Course: ${courseLabel}\n⏰ Due: ${whenText}\n\n🔧 This might be due to:\n• Canvas API permissions\n• Network connectivity\n• Canvas server issues\n\nPlease add this task manually to your Canvas or try again later.` 
-    } 
-  });
+  await sendTextMessage(senderId, `❌ Could not create task in Canvas Dashboard.\n\n📝 Task: "${title}"\n📚 Course: ${courseLabel}\n⏰ Due: ${whenText}\n\n🔧 This might be due to:\n• Canvas API permissions\n• Network connectivity\n• Canvas server issues\n\nPlease add this task manually to your Canvas or try again later.`);
 }
 
-// List user's active courses (id, name)
-async function listUserCourses(token) {
-  const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
-  const res = await axios.get(`${canvasUrl}/api/v1/courses`, {
-    headers: { 'Authorization': `Bearer ${token}` },
-    params: { enrollment_state: 'active', per_page: 50 },
-    timeout: 10000
-  });
-  return (res.data || []).map(c => ({ id: c.id, name: c.name }));
+// List user's active courses (id, name); shares the per-token course cache
+// with the assignment fetch, so the add-task flow rarely waits on Canvas
+async function listUserCourses(token, options = {}) {
+  return canvas.getUserCourses(token, options);
 }
 
 // Combine date and time into a single Date object (using Manila timezone)
 function combineDateAndTime(dateObj, timeObj) {
-  // Extract date parts in Manila timezone using Intl.DateTimeFormat
-  const formatter = new Intl.DateTimeFormat('en-CA', {
-    timeZone: 'Asia/Manila',
-    year: 'numeric',
-    month: '2-digit',
-    day: '2-digit'
-  });
-  
-  const parts = formatter.formatToParts(dateObj);
-  const year = parseInt(parts.find(p => p.type === 'year').value);
-  const month = parseInt(parts.find(p => p.type === 'month').value);
-  const day = parseInt(parts.find(p => p.type === 'day').value);
+  const { year, month, day } = getManilaParts(MANILA_DATE_FORMAT, dateObj);
   
   return buildManilaDateFromParts({
     year,
@@ -1781,43 +1784,19 @@ function combineDateAndTime(dateObj, timeObj) {
 // Helper function to get current date/time in Manila timezone
 function getManilaDate(date = new Date()) {
   // Get the current Manila time using proper timezone conversion
-  const formatter = new Intl.DateTimeFormat('en-CA', {
-    timeZone: 'Asia/Manila',
-    year: 'numeric',
-    month: '2-digit',
-    day: '2-digit',
-    hour: '2-digit',
-    minute: '2-digit',
-    second: '2-digit',
-    hour12: false
-  });
-  
-  const parts = formatter.formatToParts(date);
-  const year = parseInt(parts.find(p => p.type === 'year').value);
-  const month = parseInt(parts.find(p => p.type === 'month').value);
-  const day = parseInt(parts.find(p => p.type === 'day').value);
-  const hour = parseInt(parts.find(p => p.type === 'hour').value);
-  const minute = parseInt(parts.find(p => p.type === 'minute').value);
-  const second = parseInt(parts.find(p => p.type === 'second').value);
+  const { year, month, day, hour, minute } = getManilaParts(MANILA_DATE_TIME_FORMAT, date);
   
   // Create a proper Manila time Date object
   return buildManilaDateFromParts({ year, month, day, hour, minute });
 }
 
-// Helper function to check if two dates are the same day in Manila timezone
-function isSameDayManila(date1, date2) {
-  // Get date parts directly in Manila timezone using Intl.DateTimeFormat
-  const getDateParts = (date) => {
-    const formatter = new Intl.DateTimeFormat('en-CA', {
-      timeZone: 'Asia/Manila',
-      year: 'numeric',
-      month: '2-digit', 
-      day: '2-digit'
-    });
-    return formatter.format(date);
-  };
+// Start (inclusive) and end (exclusive) instants of the Manila calendar day
+// containing `date`; Manila has no DST, so every day is exactly 24 hours
+function getManilaDayBounds(date = new Date()) {
+  const [year, month, day] = MANILA_DATE_FORMAT.format(date).split('-').map(Number);
   
-  return getDateParts(date1) === getDateParts(date2);
+  const start = buildManilaDateFromParts({ year, month, day, hour: 0, minute: 0 });
+  return { start, end: new Date(start.getTime() + 24 * 60 * 60 * 1000) };
 }
 
 // Build a Date that represents a specific local time in Manila (UTC+08:00)
@@ -1837,10 +1816,7 @@ function getTargetWeekdayManila(targetDow, preferNext = false) {
   const now = getManilaDate();
   
   // Get current day of week in Manila timezone (0=Sunday, 1=Monday, etc.)
-  const currentManilaDate = new Date().toLocaleDateString('en-US', { 
-    timeZone: 'Asia/Manila',
-    weekday: 'long'
-  });
+  const currentManilaDate = MANILA_WEEKDAY_FORMAT.format(new Date());
   const dayNames = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
   const currentDow = dayNames.indexOf(currentManilaDate);
   
@@ -1848,16 +1824,7 @@ function getTargetWeekdayManila(targetDow, preferNext = false) {
   if (delta === 0 && preferNext) delta = 7;
   
   // Get current Manila date parts
-  const parts = new Intl.DateTimeFormat('en-CA', {
-    timeZone: 'Asia/Manila',
-    year: 'numeric',
-    month: '2-digit',
-    day: '2-digit'
-  }).formatToParts(now);
-  
-  const year = parseInt(parts.find(p => p.type === 'year').value);
-  const month = parseInt(parts.find(p => p.type === 'month').value);
-  const day = parseInt(parts.find(p => p.type === 'day').value);
+  const { year, month, day } = getManilaParts(MANILA_DATE_FORMAT, now);
   
   // Create target date by adding delta days
   const targetDate = new Date(year, month - 1, day + delta);
@@ -1902,489 +1869,326 @@ function formatAssignmentMessage(assignment, options = {}) {
   if (assignment.htmlUrl) {
     assignmentUrl = assignment.htmlUrl;
   } else if (assignment.courseId && assignment.id) {
-    const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
-    assignmentUrl = `${canvasUrl}/courses/${assignment.courseId}/assignments/${assignment.id}`;
+    assignmentUrl = `${canvas.CANVAS_BASE_URL}/courses/${assignment.courseId}/assignments/${assignment.id}`;
   }
   
-  // Format the message in clean text without colors
-  let message = '';
-  
-  message += `📝 ${assignment.title}${isManual ? ' (Manual)' : ''}\n`;
-  message += `━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n`;
+  // Format the message in clean text without colors, one entry per line
+  const lines = [
+    `📝 ${assignment.title}${isManual ? ' (Manual)' : ''}`,
+    `━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━`
+  ];
   
   if (showCourseTag || assignment.course) {
-    message += `📚 Course: [${assignment.course || 'Personal'}]\n`;
+    lines.push(`📚 Course: [${assignment.course || 'Personal'}]`);
   }
   
-  message += `⏰ Due: ${dueTime}\n`;
+  lines.push(`⏰ Due: ${dueTime}`);
   
   if (assignment.pointsPossible) {
-    message += `💯 Points: ${assignment.pointsPossible}\n`;
+    lines.push(`💯 Points: ${assignment.pointsPossible}`);
   }
   
   // Add Canvas link if available
   if (assignmentUrl) {
-    message += `🔗 Link: ${assignmentUrl}\n`;
+    lines.push(`🔗 Link: ${assignmentUrl}`);
   }
   
-  return message;
+  // Every line, including the last, ends with a newline
+  lines.push('');
+  return lines.join('\n');
 }
 
-// Task display functions
-async function sendTasksToday(senderId) {
+// Empty-state notes for the task views. With nothing to list they ride in
+// the header message instead of going out as a message of their own.
+const EMPTY_TASK_VIEW_TEXT = Object.freeze({
+  today: "🎉 No tasks due today! You're all caught up!",
+  week: "🎉 No assignments due this week! Enjoy your free time!",
+  overdue: "🎉 No overdue tasks! You're staying on top of everything. Great job!",
+  upcoming: "🎉 No upcoming assignments! Your schedule is clear!"
+});
+
+function appendToLastReply(replies, text) {
+  replies[replies.length - 1] += `\n\n${text}`;
+}
+
+// Shared flow behind the task views: check for a Canvas token, then send the
+// loading message while Canvas (cached, refreshed in the background) and the
+// manual tasks in the database (Manila-aware query) are fetched together.
+// buildReplies turns the results into the reply texts, sent as one ordered
+// batch after the loading message.
+async function sendTaskView(senderId, { loadingText, taskFilter, errorLabel, buildReplies }) {
   const user = await getUser(senderId);
   
   if (!user || !user.canvas_token) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ No Canvas token found. Please add your Canvas token to sync assignments!" }
-    });
+    await sendTextMessage(senderId, "❌ No Canvas token found. Please add your Canvas token to sync assignments!");
     return;
   }
   
-  // Send loading message
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: "🔄 Fetching today's tasks from Canvas..." }
-  });
-  
   try {
-    // Fetch fresh data from Canvas
-    const canvasData = await fetchCanvasAssignments(user.canvas_token);
-    const todayManila = getManilaDate();
-    
-    const todayCanvasTasks = canvasData.assignments.filter(assignment => {
-      // Filter by today in Manila timezone
-      return isSameDayManila(assignment.dueDate, todayManila);
-    });
+    const [, canvasData, databaseTasks] = await Promise.all([
+      sendTextMessage(senderId, loadingText),
+      getCanvasAssignments(user.canvas_token),
+      db.getUserTasks(senderId, taskFilter)
+    ]);
     
-    // Get manual tasks from database due today (database query now handles Manila timezone)
-    const databaseTasks = await db.getUserTasks(senderId, { dueToday: true });
-    const todayManualTasks = databaseTasks
+    const manualTasks = databaseTasks
       .filter(task => task.is_manual && task.due_date) // Only filter for manual tasks with due dates
-      .map(dbTask => ({
-        id: dbTask.canvas_id || dbTask.id,
-        title: dbTask.title,
-        dueDate: new Date(dbTask.due_date),
-        course: dbTask.course_name,
-        courseId: dbTask.canvas_course_id,
-        description: dbTask.description,
-        isManual: true,
-        canvasType: dbTask.canvas_type
-      }));
-    
-    const totalTasks = todayCanvasTasks.length + todayManualTasks.length;
+      .map(Assignment.fromDatabase);
     
-    // Send header message
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: `🔥 Tasks due today (${todayManila.toLocaleDateString('en-US', { timeZone: 'Asia/Manila', weekday: 'long', month: 'short', day: 'numeric' })}):` }
-    });
+    await sendTextBatch(senderId, buildReplies(canvasData.assignments, manualTasks));
     
-    if (totalTasks > 0) {
-      // Send Canvas assignments first
-      for (const assignment of todayCanvasTasks) {
-        const assignmentText = formatAssignmentMessage(assignment, { showCourseTag: true });
-        
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: assignmentText }
-        });
-        
-        await new Promise(resolve => setTimeout(resolve, 500));
-      }
+  } catch (error) {
+    console.error(`Error fetching ${errorLabel}:`, error);
+    await sendTextMessage(senderId, "❌ Sorry, I couldn't fetch your assignments right now. Please try again later.");
+  }
+}
+
+// Task display functions
+async function sendTasksToday(senderId) {
+  await sendTaskView(senderId, {
+    loadingText: "🔄 Fetching today's tasks from Canvas...",
+    taskFilter: { dueToday: true },
+    errorLabel: 'today\'s tasks',
+    buildReplies: buildTasksTodayReplies
+  });
+}
+
+function buildTasksTodayReplies(canvasAssignments, manualTasks) {
+  const todayManila = getManilaDate();
+  
+  // Filter by today in Manila timezone: compute the day's bounds once and
+  // compare timestamps instead of formatting every due date
+  const today = getManilaDayBounds(todayManila);
+  const todayCanvasTasks = canvasAssignments.filter(assignment => {
+    return assignment.dueDate >= today.start && assignment.dueDate < today.end;
+  });
+  
+  const totalTasks = todayCanvasTasks.length + manualTasks.length;
+  
+  const replies = [];
+  
+  // Header message
+  replies.push(`🔥 Tasks due today (${todayManila.toLocaleDateString('en-US', { timeZone: 'Asia/Manila', weekday: 'long', month: 'short', day: 'numeric' })}):`);
+  
+  if (totalTasks > 0) {
+    // Canvas assignments first
+    for (const assignment of todayCanvasTasks) {
+      const assignmentText = formatAssignmentMessage(assignment, { showCourseTag: true });
       
-      // Send manual tasks
-      for (const task of todayManualTasks) {
-        const taskText = formatAssignmentMessage(task, { showCourseTag: true, isManual: true });
-        
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: taskText }
-        });
-        
-        await new Promise(resolve => setTimeout(resolve, 500));
-      }
-    } else {
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "🎉 No tasks due today! You're all caught up!" }
-      });
+      replies.push(assignmentText);
     }
     
-    // Send motivational footer
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "💪 You're doing great! Keep it up!" }
-    });
-    
-  } catch (error) {
-    console.error('Error fetching today\'s tasks:', error);
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ Sorry, I couldn't fetch your assignments right now. Please try again later." }
-    });
+    // Then manual tasks
+    for (const task of manualTasks) {
+      const taskText = formatAssignmentMessage(task, { showCourseTag: true, isManual: true });
+      
+      replies.push(taskText);
+    }
+  } else {
+    appendToLastReply(replies, EMPTY_TASK_VIEW_TEXT.today);
   }
+  
+  // Motivational footer
+  replies.push("💪 You're doing great! Keep it up!");
+  
+  return replies;
 }
 
 async function sendTasksWeek(senderId) {
-  const user = await getUser(senderId);
-  
-  if (!user || !user.canvas_token) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ No Canvas token found. Please add your Canvas token to sync assignments!" }
-    });
-    return;
-  }
+  await sendTaskView(senderId, {
+    loadingText: "🔄 Fetching this week's tasks from Canvas...",
+    taskFilter: { upcoming: true, daysAhead: 7 },
+    errorLabel: 'week\'s tasks',
+    buildReplies: buildTasksWeekReplies
+  });
+}
+
+function buildTasksWeekReplies(canvasAssignments, manualTasks) {
+  const todayManila = getManilaDate();
+  const nextWeekManila = getManilaDate();
+  nextWeekManila.setDate(nextWeekManila.getDate() + 7);
   
-  // Send loading message
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: "🔄 Fetching this week's tasks from Canvas..." }
+  // Due dates are absolute instants, so compare them directly
+  const weekCanvasTasks = canvasAssignments.filter(assignment => {
+    return assignment.dueDate >= todayManila && assignment.dueDate <= nextWeekManila;
   });
   
-  try {
-    // Fetch fresh data from Canvas
-    const canvasData = await fetchCanvasAssignments(user.canvas_token);
-    const todayManila = getManilaDate();
-    const nextWeekManila = getManilaDate();
-    nextWeekManila.setDate(nextWeekManila.getDate() + 7);
-    
-    const weekCanvasTasks = canvasData.assignments.filter(assignment => {
-      const dueDateManila = getManilaDate(assignment.dueDate);
-      return dueDateManila >= todayManila && dueDateManila <= nextWeekManila;
-    });
-    
-    // Get manual tasks from database due this week (database query now handles Manila timezone)
-    const databaseTasks = await db.getUserTasks(senderId, { upcoming: true, daysAhead: 7 });
-    const weekManualTasks = databaseTasks
-      .filter(task => task.is_manual && task.due_date) // Only filter for manual tasks with due dates
-      .map(dbTask => ({
-        id: dbTask.canvas_id || dbTask.id,
-        title: dbTask.title,
-        dueDate: new Date(dbTask.due_date),
-        course: dbTask.course_name,
-        courseId: dbTask.canvas_course_id,
-        description: dbTask.description,
-        isManual: true,
-        canvasType: dbTask.canvas_type
-      }));
-    
-    const weekTasks = [...weekCanvasTasks, ...weekManualTasks];
-    
-    // Send header message
-    const weekEndDate = nextWeekManila.toLocaleDateString('en-US', {
-      timeZone: 'Asia/Manila',
-      month: 'short',
-      day: 'numeric'
-    });
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: `⏰ Tasks due this week (until ${weekEndDate}):` }
+  const weekTasks = [...weekCanvasTasks, ...manualTasks];
+  
+  const replies = [];
+  
+  // Header message
+  const weekEndDate = nextWeekManila.toLocaleDateString('en-US', {
+    timeZone: 'Asia/Manila',
+    month: 'short',
+    day: 'numeric'
+  });
+  replies.push(`⏰ Tasks due this week (until ${weekEndDate}):`);
+  
+  if (weekTasks.length > 0) {
+    // Group tasks by day for better organization
+    const tasksByDay = {};
+    weekTasks.forEach(assignment => {
+      const dayKey = assignment.dueDate.toLocaleDateString('en-US', {
+        timeZone: 'Asia/Manila',
+        weekday: 'long',
+        month: 'short',
+        day: 'numeric'
+      });
+      (tasksByDay[dayKey] ??= []).push(assignment);
     });
     
-    if (weekTasks.length > 0) {
-      // Group tasks by day for better organization
-      const tasksByDay = {};
-      weekTasks.forEach(assignment => {
-        const dayKey = assignment.dueDate.toLocaleDateString('en-US', {
-          timeZone: 'Asia/Manila',
-          weekday: 'long',
-          month: 'short',
-          day: 'numeric'
-        });
-        if (!tasksByDay[dayKey]) {
-          tasksByDay[dayKey] = [];
-        }
-        tasksByDay[dayKey].push(assignment);
-      });
+    // Tasks grouped by day
+    for (const [day, tasks] of Object.entries(tasksByDay)) {
+      replies.push(`📅 **${day}**`);
       
-      // Send tasks grouped by day
-      for (const [day, tasks] of Object.entries(tasksByDay)) {
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: `📅 **${day}**` }
+      for (const assignment of tasks) {
+        const assignmentText = formatAssignmentMessage(assignment, { 
+          showCourseTag: true, 
+          isManual: assignment.isManual 
         });
         
-        for (const assignment of tasks) {
-          const assignmentText = formatAssignmentMessage(assignment, { 
-            showCourseTag: true, 
-            isManual: assignment.isManual 
-          });
-          
-          await sendMessage({
-            recipient: { id: senderId },
-            message: { text: assignmentText }
-          });
-          
-          // Small delay between messages
-          await new Promise(resolve => setTimeout(resolve, 500));
-        }
+        replies.push(assignmentText);
       }
-      
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: `📊 Total: ${weekTasks.length} assignment${weekTasks.length === 1 ? '' : 's'} this week` }
-      });
-    } else {
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "🎉 No assignments due this week! Enjoy your free time!" }
-      });
     }
     
-    // Send motivational footer
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "📚 Stay organized! You've got this!" }
-    });
-    
-  } catch (error) {
-    console.error('Error fetching week\'s tasks:', error);
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ Sorry, I couldn't fetch your assignments right now. Please try again later." }
-    });
+    replies.push(`📊 Total: ${weekTasks.length} assignment${weekTasks.length === 1 ? '' : 's'} this week`);
+  } else {
+    appendToLastReply(replies, EMPTY_TASK_VIEW_TEXT.week);
   }
+  
+  // Motivational footer
+  replies.push("📚 Stay organized! You've got this!");
+  
+  return replies;
 }
 
 async function sendOverdueTasks(senderId) {
-  const user = await getUser(senderId);
+  await sendTaskView(senderId, {
+    loadingText: "🔄 Checking for overdue tasks...",
+    taskFilter: { overdue: true },
+    errorLabel: 'overdue tasks',
+    buildReplies: buildOverdueTasksReplies
+  });
+}
+
+function buildOverdueTasksReplies(canvasAssignments, manualTasks) {
+  const nowManila = getManilaDate();
+  const cutoffDate = getManilaDate();
+  cutoffDate.setDate(cutoffDate.getDate() - 300); // 300 days ago
   
-  if (!user || !user.canvas_token) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ No Canvas token found. Please add your Canvas token to sync assignments!" }
-    });
-    return;
-  }
+  const overdueCanvasTasks = canvasAssignments.filter(assignment => {
+    // Only show tasks that are overdue but not more than 300 days old
+    return assignment.dueDate < nowManila && assignment.dueDate > cutoffDate;
+  });
   
-  // Send loading message
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: "🔄 Checking for overdue tasks..." }
+  // Filter out tasks older than 300 days for UI purposes (database might return more)
+  const filteredOverdueManualTasks = manualTasks.filter(task => {
+    return task.dueDate > cutoffDate; // Keep tasks newer than 300 days
   });
   
-  try {
-    // Fetch fresh data from Canvas
-    const canvasData = await fetchCanvasAssignments(user.canvas_token);
-    const nowManila = getManilaDate();
-    const cutoffDate = getManilaDate();
-    cutoffDate.setDate(cutoffDate.getDate() - 300); // 300 days ago
-    
-    const overdueCanvasTasks = canvasData.assignments.filter(assignment => {
-      const dueDateManila = getManilaDate(assignment.dueDate);
-      // Only show tasks that are overdue but not more than 300 days old
-      return dueDateManila < nowManila && dueDateManila > cutoffDate;
-    });
-    
-    // Get manual tasks from database that are overdue (database query now handles Manila timezone)
-    const databaseTasks = await db.getUserTasks(senderId, { overdue: true });
-    const overdueManualTasks = databaseTasks
-      .filter(task => task.is_manual && task.due_date) // Only filter for manual tasks with due dates
-      .map(dbTask => ({
-        id: dbTask.canvas_id || dbTask.id,
-        title: dbTask.title,
-        dueDate: new Date(dbTask.due_date),
-        course: dbTask.course_name,
-        courseId: dbTask.canvas_course_id,
-        description: dbTask.description,
-        isManual: true,
-        canvasType: dbTask.canvas_type
-      }));
-    
-    // Filter out tasks older than 300 days for UI purposes (database might return more)
-    // Reuse cutoffDate already declared above
-    const filteredOverdueManualTasks = overdueManualTasks.filter(task => {
-      const dueDateManila = getManilaDate(task.dueDate);
-      return dueDateManila > cutoffDate; // Keep tasks newer than 300 days
-    });
-    
-    const overdueTasks = [...overdueCanvasTasks, ...filteredOverdueManualTasks];
-    
-    // Sort by how recently they were due (most recent first)
-    overdueTasks.sort((a, b) => b.dueDate - a.dueDate);
-    
-    // Send header message
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "⚠ Overdue tasks (excluding items older than 300 days):" }
-    });
+  const overdueTasks = [...overdueCanvasTasks, ...filteredOverdueManualTasks];
+  
+  const replies = [];
+  
+  // Header message
+  replies.push("⚠ Overdue tasks (excluding items older than 300 days):");
+  
+  if (overdueTasks.length > 0) {
+    // Limit to the 15 most recently due overdue tasks (most recent first)
+    const tasksToShow = selectTop(overdueTasks, 15, byDueDateDesc);
     
-    if (overdueTasks.length > 0) {
-      // Limit to 15 most recent overdue tasks
-      const tasksToShow = overdueTasks.slice(0, 15);
+    for (const assignment of tasksToShow) {
+      const daysOverdue = Math.floor((nowManila - assignment.dueDate) / (1000 * 60 * 60 * 24));
+      const overdueText = daysOverdue === 1 ? '1 day' : `${daysOverdue} days`;
       
-      for (const assignment of tasksToShow) {
-        const daysOverdue = Math.floor((nowManila - assignment.dueDate) / (1000 * 60 * 60 * 24));
-        const overdueText = daysOverdue === 1 ? '1 day' : `${daysOverdue} days`;
-        
-        // Use formatter with additional overdue information
-        let assignmentText = formatAssignmentMessage(assignment, { 
-          showCourseTag: true, 
-          isManual: assignment.isManual 
-        });
-        
-        // Add overdue indicator
-        assignmentText = assignmentText.replace('```', `🔴 OVERDUE: ${overdueText}\n\`\`\``);
-        
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: assignmentText }
-        });
-        
-        // Small delay between messages
-        await new Promise(resolve => setTimeout(resolve, 500));
-      }
+      // Use formatter with additional overdue information
+      let assignmentText = formatAssignmentMessage(assignment, { 
+        showCourseTag: true, 
+        isManual: assignment.isManual 
+      });
       
-      if (overdueTasks.length > 15) {
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: `... and ${overdueTasks.length - 15} more overdue assignments` }
-        });
-      }
+      // Add overdue indicator
+      assignmentText = assignmentText.replace('```', `🔴 OVERDUE: ${overdueText}\n\`\`\``);
       
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "💡 Don't worry! You can still submit these. Contact your instructors if you need extensions." }
-      });
-    } else {
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "🎉 No overdue tasks! You're staying on top of everything. Great job!" }
-      });
+      replies.push(assignmentText);
     }
     
-  } catch (error) {
-    console.error('Error fetching overdue tasks:', error);
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ Sorry, I couldn't fetch your assignments right now. Please try again later." }
-    });
+    if (overdueTasks.length > 15) {
+      replies.push(`... and ${overdueTasks.length - 15} more overdue assignments`);
+    }
+    
+    replies.push("💡 Don't worry! You can still submit these. Contact your instructors if you need extensions.");
+  } else {
+    appendToLastReply(replies, EMPTY_TASK_VIEW_TEXT.overdue);
   }
+  
+  return replies;
 }
 
 async function sendAllUpcoming(senderId) {
-  const user = await getUser(senderId);
-  
-  if (!user || !user.canvas_token) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ No Canvas token found. Please add your Canvas token to sync assignments!" }
-    });
-    return;
-  }
+  await sendTaskView(senderId, {
+    loadingText: "🔄 Fetching all upcoming assignments from Canvas...",
+    taskFilter: { upcoming: true, daysAhead: 365 }, // Get all upcoming tasks (1 year)
+    errorLabel: 'upcoming tasks',
+    buildReplies: buildAllUpcomingReplies
+  });
+}
+
+function buildAllUpcomingReplies(canvasAssignments, manualTasks) {
+  const nowManila = getManilaDate();
   
-  // Send loading message
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: "🔄 Fetching all upcoming assignments from Canvas..." }
+  const upcomingCanvasTasks = canvasAssignments.filter(assignment => {
+    return assignment.dueDate >= nowManila;
   });
   
-  try {
-    // Fetch fresh data from Canvas
-    const canvasData = await fetchCanvasAssignments(user.canvas_token);
-    const nowManila = getManilaDate();
-    
-    const upcomingCanvasTasks = canvasData.assignments.filter(assignment => {
-      const dueDateManila = getManilaDate(assignment.dueDate);
-      return dueDateManila >= nowManila;
-    });
-    
-    // Get manual tasks from database that are upcoming (database query now handles Manila timezone)
-    const databaseTasks = await db.getUserTasks(senderId, { upcoming: true, daysAhead: 365 }); // Get all upcoming tasks (1 year)
-    const upcomingManualTasks = databaseTasks
-      .filter(task => task.is_manual && task.due_date) // Only filter for manual tasks with due dates
-      .map(dbTask => ({
-        id: dbTask.canvas_id || dbTask.id,
-        title: dbTask.title,
-        dueDate: new Date(dbTask.due_date),
-        course: dbTask.course_name,
-        courseId: dbTask.canvas_course_id,
-        description: dbTask.description,
-        isManual: true,
-        canvasType: dbTask.canvas_type
-      }));
-    
-    const upcomingTasks = [...upcomingCanvasTasks, ...upcomingManualTasks];
-    
-    // Sort all tasks by due date
-    upcomingTasks.sort((a, b) => a.dueDate - b.dueDate);
+  const upcomingTasks = [...upcomingCanvasTasks, ...manualTasks];
+  
+  const replies = [];
+  
+  // Header message
+  replies.push(`📅 All upcoming assignments (${upcomingTasks.length} total):`);
+  
+  if (upcomingTasks.length > 0) {
+    // Limit to the 20 earliest assignments to avoid overwhelming
+    const tasksToShow = selectTop(upcomingTasks, 20, byDueDate);
     
-    // Send header message
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: `📅 All upcoming assignments (${upcomingTasks.length} total):` }
+    // Group by month for better organization
+    const tasksByMonth = {};
+    tasksToShow.forEach(assignment => {
+      const monthKey = assignment.dueDate.toLocaleDateString('en-US', {
+        timeZone: 'Asia/Manila',
+        year: 'numeric',
+        month: 'long'
+      });
+      (tasksByMonth[monthKey] ??= []).push(assignment);
     });
     
-    if (upcomingTasks.length > 0) {
-      // Limit to 20 assignments to avoid overwhelming
-      const tasksToShow = upcomingTasks.slice(0, 20);
-      
-      // Group by month for better organization
-      const tasksByMonth = {};
-      tasksToShow.forEach(assignment => {
-        const monthKey = assignment.dueDate.toLocaleDateString('en-US', {
-          timeZone: 'Asia/Manila',
-          year: 'numeric',
-          month: 'long'
-        });
-        if (!tasksByMonth[monthKey]) {
-          tasksByMonth[monthKey] = [];
-        }
-        tasksByMonth[monthKey].push(assignment);
-      });
+    // Tasks grouped by month
+    for (const [month, tasks] of Object.entries(tasksByMonth)) {
+      replies.push(`📆 **${month}**`);
       
-      // Send tasks grouped by month
-      for (const [month, tasks] of Object.entries(tasksByMonth)) {
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: `📆 **${month}**` }
+      for (const assignment of tasks) {
+        const assignmentText = formatAssignmentMessage(assignment, { 
+          showCourseTag: true,
+          isManual: assignment.isManual
         });
         
-        for (const assignment of tasks) {
-          const assignmentText = formatAssignmentMessage(assignment, { 
-            showCourseTag: true,
-            isManual: assignment.isManual
-          });
-          
-          await sendMessage({
-            recipient: { id: senderId },
-            message: { text: assignmentText }
-          });
-          
-          // Small delay between messages
-          await new Promise(resolve => setTimeout(resolve, 500));
-        }
-      }
-      
-      if (upcomingTasks.length > 20) {
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { text: `📊 Showing 20 of ${upcomingTasks.length} total upcoming assignments` }
-        });
+        replies.push(assignmentText);
       }
-    } else {
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: "🎉 No upcoming assignments! Your schedule is clear!" }
-      });
     }
     
-    // Send motivational footer
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "💼 Stay focused and tackle them one by one!" }
-    });
-    
-  } catch (error) {
-    console.error('Error fetching upcoming tasks:', error);
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "❌ Sorry, I couldn't fetch your assignments right now. Please try again later." }
-    });
+    if (upcomingTasks.length > 20) {
+      replies.push(`📊 Showing 20 of ${upcomingTasks.length} total upcoming assignments`);
+    }
+  } else {
+    appendToLastReply(replies, EMPTY_TASK_VIEW_TEXT.upcoming);
   }
+  
+  // Motivational footer
+  replies.push("💼 Stay focused and tackle them one by one!");
+  
+  return replies;
 }
 
 async function sendAddTaskFlow(senderId) {
@@ -2413,20 +2217,17 @@ async function sendActivationMessage(senderId) {
 async function sendCourseSelection(senderId) {
   const user = await getUser(senderId);
   if (!user || !user.canvas_token) {
-    await sendMessage({ recipient: { id: senderId }, message: { text: "❌ No Canvas token found. Please set up Canvas first from the menu: Canvas Setup." } });
+    await sendTextMessage(senderId, "❌ No Canvas token found. Please set up Canvas first from the menu: Canvas Setup.");
     return;
   }
   try {
     const courses = await listUserCourses(user.canvas_token);
-    const quickReplies = [];
-    // Add up to 10 courses as quick replies
-    courses.slice(0, 10).forEach(c => {
+    // Add up to 10 courses as quick replies, then Personal and Other options
+    const quickReplies = courses.slice(0, 10).map(c => {
       const title = c.name.length > 20 ? c.name.slice(0, 19) + '…' : c.name;
-      quickReplies.push({ content_type: 'text', title, payload: `SELECT_COURSE_${c.id}` });
+      return { content_type: 'text', title, payload: `SELECT_COURSE_${c.id}` };
     });
-    // Add Personal and Other options
-    quickReplies.push({ content_type: 'text', title: '📁 Personal', payload: 'SELECT_COURSE_PERSONAL' });
-    quickReplies.push({ content_type: 'text', title: '✏️ Other Course', payload: 'SELECT_COURSE_OTHER' });
+    quickReplies.push(...COURSE_PICKER_EXTRA_REPLIES);
 
     await sendMessage({
       recipient: { id: senderId },
@@ -2437,55 +2238,21 @@ async function sendCourseSelection(senderId) {
     });
   } catch (e) {
     console.error('Failed to fetch courses for selection:', e.message);
-    await sendMessage({ recipient: { id: senderId }, message: { text: 'I could not load your courses. Please try again later.' } });
+    await sendTextMessage(senderId, 'I could not load your courses. Please try again later.');
   }
 }
 
 async function sendAskCustomCourseName(senderId) {
-  await sendMessage({ recipient: { id: senderId }, message: { text: 'Please type the course name:' } });
+  await sendTextMessage(senderId, 'Please type the course name:');
 }
 
 async function sendDescriptionRequest(senderId) {
-  await sendMessage({ recipient: { id: senderId }, message: { text: 'Add a short description for this task (optional). You can also skip by sending a dash (-).' } });
+  await sendTextMessage(senderId, 'Add a short description for this task (optional). You can also skip by sending a dash (-).');
 }
 
 // New handler functions for persistent menu items
 async function sendMyTasks(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      text: "📋 My Tasks - What would you like to see?",
-      quick_replies: [
-        {
-          content_type: "text",
-          title: "🔥 Due Today",
-          payload: "GET_TASKS_TODAY"
-        },
-        {
-          content_type: "text",
-          title: "⏰ Due This Week",
-          payload: "GET_TASKS_WEEK"
-        },
-        {
-          content_type: "text",
-          title: "❗️ Show Overdue",
-          payload: "SHOW_OVERDUE"
-        },
-        {
-          content_type: "text",
-          title: "🗓 View All Upcoming",
-          payload: "VIEW_ALL_UPCOMING"
-        },
-        {
-          content_type: "text",
-          title: "➕ Add New Task",
-          payload: "ADD_NEW_TASK"
-        }
-      ]
-    }
-  };
-  
-  await sendMessage(message);
+  await sendSerializedMessage(senderId, MY_TASKS_MESSAGE_JSON);
 }
 
 async function sendCanvasSetup(senderId) {
@@ -2496,23 +2263,7 @@ async function sendCanvasSetup(senderId) {
       recipient: { id: senderId },
       message: {
         text: "🔧 Canvas Setup\n\nI don't see a Canvas token connected to your account. Let's set that up!\n\nDo you know how to get your Canvas Access Token?",
-        quick_replies: [
-          {
-            content_type: "text",
-            title: "✅ Yes, I have it",
-            payload: "HAVE_TOKEN"
-          },
-          {
-            content_type: "text",
-            title: "📖 Show Instructions",
-            payload: "SHOW_TUTORIAL"
-          },
-          {
-            content_type: "text",
-            title: "🎥 Watch Video Tutorial",
-            payload: "SHOW_VIDEO_TUTORIAL"
-          }
-        ]
+        quick_replies: TOKEN_REQUEST_REPLIES
       }
     };
     
@@ -2522,28 +2273,7 @@ async function sendCanvasSetup(senderId) {
       recipient: { id: senderId },
       message: {
         text: `🔧 Canvas Setup\n\n✅ Connected as: ${user.canvas_user_name || 'Canvas User'}\n\nYour Canvas account is already connected and working properly!\n\nWhat would you like to do?`,
-        quick_replies: [
-          {
-            content_type: "text",
-            title: "🔄 Reconnect Canvas",
-            payload: "SHOW_TUTORIAL"
-          },
-          {
-            content_type: "text",
-            title: "🧪 Test Connection",
-            payload: "TEST_CANVAS_CONNECTION"
-          },
-          {
-            content_type: "text",
-            title: "🔍 Check Recent Tasks",
-            payload: "VIEW_RECENT_TASKS"
-          },
-          {
-            content_type: "text",
-            title: "📋 View My Tasks",
-            payload: "MY_TASKS"
-          }
-        ]
+        quick_replies: CANVAS_CONNECTED_REPLIES
       }
     };
     
@@ -2552,41 +2282,7 @@ async function sendCanvasSetup(senderId) {
 }
 
 async function sendHelpAndSupport(senderId) {
-  const message = {
-    recipient: { id: senderId },
-    message: {
-      text: "❓ Help & Support\n\nI'm here to help! What do you need assistance with?",
-      quick_replies: [
-        {
-          content_type: "text",
-          title: "🔧 Canvas Setup Help",
-          payload: "CANVAS_SETUP"
-        },
-        {
-          content_type: "text",
-          title: "📖 How to Use Easely",
-          payload: "HOW_TO_USE"
-        },
-        {
-          content_type: "text",
-          title: "🐛 Report a Problem",
-          payload: "REPORT_PROBLEM"
-        },
-        {
-          content_type: "text",
-          title: "💡 Feature Request",
-          payload: "FEATURE_REQUEST"
-        },
-        {
-          content_type: "text",
-          title: "📞 Contact Support",
-          payload: "CONTACT_SUPPORT"
-        }
-      ]
-    }
-  };
-  
-  await sendMessage(message);
+  await sendSerializedMessage(senderId, HELP_AND_SUPPORT_MESSAGE_JSON);
 }
 
 async function sendUpgradeToPremium(senderId) {
@@ -2625,14 +2321,9 @@ async function sendUpgradeToPremium(senderId) {
     await sendMessage(message);
     
     // Follow up with activation instructions
-    setTimeout(async () => {
-      await sendMessage({
-        recipient: { id: senderId },
-        message: {
-          text: "After supporting on Ko-fi, send me the word 'activate' to enable your Premium features! 🚀"
-        }
-      });
-    }, 3000);
+    sendLater(3000, async () => {
+      await sendTextMessage(senderId, "After supporting on Ko-fi, send me the word 'activate' to enable your Premium features! 🚀");
+    });
   }
 }
 
@@ -2641,42 +2332,27 @@ async function testCanvasConnection(senderId) {
   const user = await getUser(senderId);
   
   if (!user || !user.canvas_token) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: "No Canvas token found. Please set up Canvas first!\n\nUse 'Canvas Setup' from the menu to connect your account." }
-    });
+    await sendTextMessage(senderId, "No Canvas token found. Please set up Canvas first!\n\nUse 'Canvas Setup' from the menu to connect your account.");
     return;
   }
   
-  await sendMessage({
-    recipient: { id: senderId },
-    message: { text: "🔍 Testing your Canvas connection and permissions..." }
-  });
+  await sendTextMessage(senderId, "🔍 Testing your Canvas connection and permissions...");
   
   try {
-    const validation = await validateCanvasToken(user.canvas_token);
+    // Always hit Canvas here: this is the user's explicit connection check
+    const validation = await validateCanvasToken(user.canvas_token, { forceRefresh: true });
     
     if (validation.valid) {
       // Check permissions for task creation
       await checkCanvasPermissions(user.canvas_token);
       
-      const canvasUrl = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
-      const successMessage = `✅ Connection successful!\n\n👤 Connected as: ${validation.user.name}\n🌐 Canvas URL: ${canvasUrl}\n\n💡 Your Canvas connection is working. If task creation fails, it might be due to API permissions on your Canvas token.`;
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: successMessage }
-      });
+      const successMessage = `✅ Connection successful!\n\n👤 Connected as: ${validation.user.name}\n🌐 Canvas URL: ${canvas.CANVAS_BASE_URL}\n\n💡 Your Canvas connection is working. If task creation fails, it might be due to API permissions on your Canvas token.`;
+      await sendTextMessage(senderId, successMessage);
     } else {
-      await sendMessage({
-        recipient: { id: senderId },
-        message: { text: `❌ Connection failed: ${validation.error}\n\nPlease try reconnecting your Canvas account.` }
-      });
+      await sendTextMessage(senderId, `❌ Connection failed: ${validation.error}\n\nPlease try reconnecting your Canvas account.`);
     }
   } catch (error) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: `❌ Connection test failed: ${error.message}\n\nPlease check your internet connection and try again.` }
-    });
+    await sendTextMessage(senderId, `❌ Connection test failed: ${error.message}\n\nPlease check your internet connection and try again.`);
   }
 }
 
@@ -2686,34 +2362,18 @@ async function sendHowToUse(senderId) {
     "4. **Get Reminders**: Receive notifications before assignments are due (Premium: multiple reminders)\n\n5. **Stay Organized**: Check in daily to review your tasks and deadlines\n\n**Pro Tips**:\n• Say 'menu' anytime to see options\n• Say 'activate' after Ko-fi support to enable Premium\n• Check 'Due Today' each morning to plan your day"
   ];
   
-  for (const text of messages) {
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text }
-    });
-    await new Promise(resolve => setTimeout(resolve, 1000));
-  }
+  await sendTextBatch(senderId, messages);
 }
 
 async function sendReportProblem(senderId) {
-  await sendMessage({
-    recipient: { id: senderId },
-    message: {
-      text: "Report a Problem\n\nI'm sorry you're experiencing issues! Please describe the problem you're facing, and I'll log it for our development team.\n\nCommon issues:\n• Canvas not syncing\n• Incorrect due dates\n• Missing assignments\n• Login problems\n\nPlease describe your issue:"
-    }
-  });
+  await sendTextMessage(senderId, "Report a Problem\n\nI'm sorry you're experiencing issues! Please describe the problem you're facing, and I'll log it for our development team.\n\nCommon issues:\n• Canvas not syncing\n• Incorrect due dates\n• Missing assignments\n• Login problems\n\nPlease describe your issue:");
   
   // Could set a session to capture the problem description
   await setUserSession(senderId, { flow: 'report_problem', step: 'description' });
 }
 
 async function sendFeatureRequest(senderId) {
-  await sendMessage({
-    recipient: { id: senderId },
-    message: {
-      text: "Feature Request\n\nWe love hearing your ideas! What feature would you like to see in Easely?\n\nPopular requests:\n• Grade tracking\n• Assignment submission\n• Course schedule view\n• Study groups\n• Custom reminder times\n\nPlease share your idea:"
-    }
-  });
+  await sendTextMessage(senderId, "Feature Request\n\nWe love hearing your ideas! What feature would you like to see in Easely?\n\nPopular requests:\n• Grade tracking\n• Assignment submission\n• Course schedule view\n• Study groups\n• Custom reminder times\n\nPlease share your idea:");
   
   // Could set a session to capture the feature request
   await setUserSession(senderId, { flow: 'feature_request', step: 'description' });
@@ -2755,82 +2415,33 @@ async function sendGenericResponse(senderId) {
   await sendMessage(message);
 }
 
+// Task due date quick replies: each returns an instant on the target Manila
+// day, and the task is stored at the start of that day
+const TASK_DUE_DATES = {
+  TASK_DATE_TODAY: () => new Date(),
+  TASK_DATE_TOMORROW: () => new Date(Date.now() + 24 * 60 * 60 * 1000),
+  TASK_DATE_FRIDAY: () => getTargetWeekdayManila(5, true), // 5 = Friday, preferNext = true
+  TASK_DATE_NEXT_MONDAY: () => getTargetWeekdayManila(1, true) // 1 = Monday, preferNext = true
+};
+
+// Task due time quick replies
+const TASK_DUE_TIMES = {
+  TASK_TIME_8AM: { hour: 8, minute: 0 },
+  TASK_TIME_12PM: { hour: 12, minute: 0 },
+  TASK_TIME_5PM: { hour: 17, minute: 0 },
+  TASK_TIME_8PM: { hour: 20, minute: 0 },
+  TASK_TIME_11_59PM: { hour: 23, minute: 59 }
+};
+
 // Handle task date quick replies
-async function handleTaskDateQuickReply(senderId, dateType) {
+async function handleTaskDateQuickReply(senderId, resolveDate) {
   const session = await getUserSession(senderId);
   if (!session || session.flow !== 'add_task' || session.step !== 'date') {
     await sendGenericResponse(senderId);
     return;
   }
   
-  const now = getManilaDate();
-  let taskDate;
-  
-  // Helper function to extract Manila date components
-  const getManilaDateParts = (date) => {
-    const formatter = new Intl.DateTimeFormat('en-CA', {
-      timeZone: 'Asia/Manila',
-      year: 'numeric',
-      month: '2-digit',
-      day: '2-digit'
-    });
-    const parts = formatter.formatToParts(date);
-    return {
-      year: parseInt(parts.find(p => p.type === 'year').value),
-      month: parseInt(parts.find(p => p.type === 'month').value),
-      day: parseInt(parts.find(p => p.type === 'day').value)
-    };
-  };
-  
-  switch (dateType) {
-    case 'today':
-      const todayParts = getManilaDateParts(new Date());
-      taskDate = buildManilaDateFromParts({
-        year: todayParts.year,
-        month: todayParts.month,
-        day: todayParts.day,
-        hour: 0,
-        minute: 0
-      });
-      break;
-    case 'tomorrow':
-      const tomorrow = new Date();
-      tomorrow.setUTCDate(tomorrow.getUTCDate() + 1); // Add 1 day in UTC to avoid timezone confusion
-      const tomorrowParts = getManilaDateParts(tomorrow);
-      taskDate = buildManilaDateFromParts({
-        year: tomorrowParts.year,
-        month: tomorrowParts.month,
-        day: tomorrowParts.day,
-        hour: 0,
-        minute: 0
-      });
-      break;
-    case 'friday':
-      const targetFriday = getTargetWeekdayManila(5, true); // 5 = Friday, preferNext = true
-      const fridayParts = getManilaDateParts(targetFriday);
-      taskDate = buildManilaDateFromParts({
-        year: fridayParts.year,
-        month: fridayParts.month,
-        day: fridayParts.day,
-        hour: 0,
-        minute: 0
-      });
-      break;
-    case 'nextmonday':
-      const targetMonday = getTargetWeekdayManila(1, true); // 1 = Monday, preferNext = true
-      const mondayParts = getManilaDateParts(targetMonday);
-      taskDate = buildManilaDateFromParts({
-        year: mondayParts.year,
-        month: mondayParts.month,
-        day: mondayParts.day,
-        hour: 0,
-        minute: 0
-      });
-      break;
-    default:
-      await sendGenericResponse(senderId);
-      return;
-  }
+  const taskDate = getManilaDayBounds(resolveDate()).start;
   
   // Store date and ask for time
   await setUserSession(senderId, { ...session, step: 'time', taskDate });
@@ -2871,10 +2482,7 @@ async function handleTaskTimeQuickReply(senderId, hour, minute) {
     console.log(`🗓️ Final task date/time: ${finalDateTime.toISOString()}`);
     
     // Send immediate acknowledgment to user
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { text: `⏳ Creating your task "${session.taskTitle}"...` }
-    });
+    await sendTextMessage(senderId, `⏳ Creating your task "${session.taskTitle}"...`);
     
     // Create the task in Canvas using Planner Notes
     console.log(`🔄 Starting Canvas task creation for user ${senderId}`);
@@ -2918,22 +2526,12 @@ async function handleTaskTimeQuickReply(senderId, hour, minute) {
         console.log(`💾 Fallback task stored in database for user ${senderId}`);
         
         // Send success message with note about Canvas sync failure
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { 
-            text: `✅ Task "${session.taskTitle}" created successfully!\n\n🗓️ Due: ${formatDateTimeManila(finalDateTime)}\n💻 Course: ${session.courseName || 'Personal'}\n\n⚠️ Note: Could not sync to Canvas Dashboard. You may need to add it manually to Canvas if needed.` 
-          }
-        });
+        await sendTextMessage(senderId, `✅ Task "${session.taskTitle}" created successfully!\n\n🗓️ Due: ${formatDateTimeManila(finalDateTime)}\n💻 Course: ${session.courseName || 'Personal'}\n\n⚠️ Note: Could not sync to Canvas Dashboard. You may need to add it manually to Canvas if needed.`);
       } catch (dbError) {
         console.error('❌ Fallback task creation also failed:', dbError);
         
         // Last resort: just acknowledge the task was received
-        await sendMessage({
-          recipient: { id: senderId },
-          message: { 
-            text: `❌ Sorry, I couldn't save your task "${session.taskTitle}" to the system. Please add it manually to Canvas.\n\n🗓️ Due: ${formatDateTimeManila(finalDateTime)}\n💻 Course: ${session.courseName || 'Personal'}` 
-          }
-        });
+        await sendTextMessage(senderId, `❌ Sorry, I couldn't save your task "${session.taskTitle}" to the system. Please add it manually to Canvas.\n\n🗓️ Due: ${formatDateTimeManila(finalDateTime)}\n💻 Course: ${session.courseName || 'Personal'}`);
       }
     }
     
@@ -2941,22 +2539,17 @@ async function handleTaskTimeQuickReply(senderId, hour, minute) {
     console.error(`💥 Unexpected error in handleTaskTimeQuickReply for user ${senderId}:`, error);
     
     // Send error message to user
-    await sendMessage({
-      recipient: { id: senderId },
-      message: { 
-        text: `❌ Sorry, there was an error creating your task "${session.taskTitle}". Please try again or add it manually to Canvas.` 
-      }
-    });
+    await sendTextMessage(senderId, `❌ Sorry, there was an error creating your task "${session.taskTitle}". Please try again or add it manually to Canvas.`);
   } finally {
     // Always clean up session and show welcome message
     console.log(`🧹 Cleaning up session for user ${senderId}`);
     await clearUserSession(senderId);
     
     // Show updated task list after a moment
-    setTimeout(async () => {
+    sendLater(2000, async () => {
       console.log(`🏠 Showing welcome message to user ${senderId}`);
       await sendWelcomeMessage(senderId);
-    }, 2000);
+    });
   }
 }
 
@@ -2974,15 +2567,7 @@ function isCanvasToken(text) {
 // Send message to Facebook Messenger API
 async function sendMessage(messageData) {
   try {
-    const response = await axios.post(
-      `https://graph.facebook.com/v18.0/me/messages?access_token=${PAGE_ACCESS_TOKEN}`,
-      messageData,
-      {
-        headers: {
-          'Content-Type': 'application/json'
-        }
-      }
-    );
+    const response = await messenger.callSendAPI(messageData);
     
     console.log('Message sent successfully:', response.data);
   } catch (error) {
@@ -2990,6 +2575,52 @@ async function sendMessage(messageData) {
   }
 }
 
+// Send a plain text message; builds the Send API payload in one literal
+async function sendTextMessage(senderId, text) {
+  await sendMessage({ recipient: { id: senderId }, message: { text } });
+}
+
+// Send a message body that was serialized ahead of time, splicing in the
+// recipient instead of re-serializing the whole payload per send; graphPost
+// sends string bodies raw, so the JSON is never parsed again
+async function sendSerializedMessage(senderId, messageJson) {
+  await sendMessage(`{"recipient":{"id":${JSON.stringify(String(senderId))}},"message":${messageJson}}`);
+}
+
+// Run a follow-up send after a pause without holding up the current
+// handler. Nothing awaits the callback, so its errors are logged here
+// instead of surfacing as unhandled rejections.
+function sendLater(delayMs, send) {
+  setTimeout(() => {
+    Promise.resolve()
+      .then(send)
+      .catch(error => console.error('Delayed send failed:', error.message));
+  }, delayMs);
+}
+
+// Send several messages to Facebook Messenger in one batch request
+async function sendMessageBatch(messages) {
+  const results = await messenger.sendBatch(messages);
+  
+  // Subrequests are chained, so nothing after the first failure went out;
+  // resend from there one at a time and leave the delivered ones alone
+  const firstUndelivered = results.findIndex(result => result?.code !== 200);
+  if (firstUndelivered === -1) {
+    console.log(`Batch of ${messages.length} messages sent successfully`);
+    return;
+  }
+  
+  console.error(`Batch send: ${messages.length - firstUndelivered}/${messages.length} messages not delivered, sending individually:`, results[firstUndelivered]?.body);
+  for (const messageData of messages.slice(firstUndelivered)) {
+    await sendMessage(messageData);
+  }
+}
+
+// Send several plain text messages, in order, as one batch request
+async function sendTextBatch(senderId, texts) {
+  await sendMessageBatch(texts.map(text => ({ recipient: { id: senderId }, message: { text } })));
+}
+
 // Broadcast message to multiple users
 async function broadcastMessage(message, targetUsers = 'all', testMode = false) {
   const results = {
@@ -3028,6 +2659,18 @@ async function broadcastMessage(message, targetUsers = 'all', testMode = false)
   results.total = targetUserIds.length;
   console.log(`Starting broadcast to ${results.total} users`);
   
+  // Serialize the broadcast message once instead of once per recipient
+  const broadcastMessageJson = JSON.stringify({
+    ...message,
+    // Add broadcast indicator if not present
+    text: message.text || '📢 Announcement from Easely',
+    // Add metadata tag to identify as broadcast
+    metadata: JSON.stringify({
+      type: 'broadcast',
+      timestamp: new Date().toISOString()
+    })
+  });
+  
   // Process in batches to respect rate limits
   const batchSize = 20; // Facebook allows up to 100 requests per second
   const delayBetweenBatches = 2000; // 2 seconds between batches
@@ -3038,25 +2681,10 @@ async function broadcastMessage(message, targetUsers = 'all', testMode = false)
     // Send messages in parallel within batch
     const batchPromises = batch.map(async (userId) => {
       try {
-        // Prepare the broadcast message with recipient
-        const broadcastData = {
-          recipient: { id: userId },
-          message: {
-            ...message,
-            // Add broadcast indicator if not present
-            text: message.text || '📢 Announcement from Easely'
-          }
-        };
-        
-        // Add metadata tag to identify as broadcast
-        if (broadcastData.message) {
-          broadcastData.message.metadata = JSON.stringify({ 
-            type: 'broadcast',
-            timestamp: new Date().toISOString() 
-          });
-        }
-        
-        await sendMessage(broadcastData);
+        // Only the recipient differs per user; splice it around the
+        // message serialized once above. The spliced string is sent raw,
+        // so no recipient's send parses or re-serializes the message.
+        await sendSerializedMessage(userId, broadcastMessageJson);
         results.successful++;
         console.log(`✅ Broadcast sent to user ${userId}`);
       } catch (error) {
@@ -3089,96 +2717,104 @@ app.use((error, req, res, next) => {
   res.status(500).json({ error: 'Internal server error' });
 });
 
-// Function to set up the persistent menu (hamburger menu) with rate limit handling
-async function setupPersistentMenu() {
-  // Skip clearing menu to avoid unnecessary API calls that might hit rate limits
-  // The new menu will overwrite the existing one anyway
-  console.log('Setting up persistent menu...');
+// Recursively freeze a static payload so nothing can mutate it after it
+// has been serialized into the cached profile bodies
+function deepFreeze(value) {
+  if (value && typeof value === 'object' && !Object.isFrozen(value)) {
+    Object.freeze(value);
+    Object.values(value).forEach(deepFreeze);
+  }
+  return value;
+}
+
+// Menu items shared by the default and en_US locales
+const MENU_CALL_TO_ACTIONS = [
+  {
+    title: "📋 My Tasks",
+    type: "postback",
+    payload: "MY_TASKS"
+  },
+  {
+    title: "🔧 Canvas Setup",
+    type: "postback",
+    payload: "CANVAS_SETUP"
+  },
+  {
+    title: "❓ Help & Support",
+    type: "postback",
+    payload: "HELP_AND_SUPPORT"
+  },
+  {
+    title: "🌟 Upgrade Premium",  // Shortened to fit Android's smaller display
+    type: "postback",
+    payload: "UPGRADE_TO_PREMIUM"
+  }
+];
+
+const PERSISTENT_MENU = deepFreeze([
+  {
+    locale: "default",
+    composer_input_disabled: false,
+    call_to_actions: MENU_CALL_TO_ACTIONS
+  },
+  // Add specific locale for English to ensure consistency
+  {
+    locale: "en_US",
+    composer_input_disabled: false,
+    call_to_actions: MENU_CALL_TO_ACTIONS
+  }
+]);
+
+const GET_STARTED = deepFreeze({
+  payload: "GET_STARTED"
+});
+
+// messenger_profile bodies never change, so serialize each field
+// combination once instead of on every setup call
+const PROFILE_BODIES = Object.freeze({
+  both: JSON.stringify({ get_started: GET_STARTED, persistent_menu: PERSISTENT_MENU }),
+  menu: JSON.stringify({ persistent_menu: PERSISTENT_MENU }),
+  getStarted: JSON.stringify({ get_started: GET_STARTED })
+});
+
+// POST the Messenger profile (hamburger menu and/or Get Started button).
+// messenger_profile accepts both fields in one body, so this is a single
+// POST instead of one per field; rate-limit errors are retried with
+// exponential backoff up to maxRetries attempts, anything else throws.
+async function postMessengerProfile({ menu = true, getStarted = true } = {}, maxRetries = 3) {
+  const profileBody = menu && getStarted ? PROFILE_BODIES.both
+    : menu ? PROFILE_BODIES.menu
+    : PROFILE_BODIES.getStarted;
   
-  // Add small delay to spread out API calls
-  await new Promise(resolve => setTimeout(resolve, 2000));
+  return callWithRetry(async () => {
+    // Pre-serialized string body; graphPost sends it raw under the client's
+    // JSON Content-Type, without axios parsing it again
+    const response = await messenger.graphPost(messenger.PROFILE_PATH, profileBody);
+    console.log('Messenger profile configured successfully:', response.data);
+    return response;
+  }, maxRetries);
+}
+
+// Function to set up the Messenger profile at startup; failures are logged
+// rather than thrown
+async function setupMessengerProfile({ menu = true, getStarted = true } = {}) {
+  if (!menu && !getStarted) return;
   
-  const menuData = {
-    persistent_menu: [
-      {
-        locale: "default",
-        composer_input_disabled: false,
-        call_to_actions: [
-          {
-            title: "📋 My Tasks",
-            type: "postback",
-            payload: "MY_TASKS"
-          },
-          {
-            title: "🔧 Canvas Setup",
-            type: "postback",
-            payload: "CANVAS_SETUP"
-          },
-          {
-            title: "❓ Help & Support",
-            type: "postback",
-            payload: "HELP_AND_SUPPORT"
-          },
-          {
-            title: "🌟 Upgrade Premium",  // Shortened to fit Android's smaller display
-            type: "postback",
-            payload: "UPGRADE_TO_PREMIUM"
-          }
-        ]
-      },
-      // Add specific locale for English to ensure consistency
-      {
-        locale: "en_US",
-        composer_input_disabled: false,
-        call_to_actions: [
-          {
-            title: "📋 My Tasks",
-            type: "postback",
-            payload: "MY_TASKS"
-          },
-          {
-            title: "🔧 Canvas Setup",
-            type: "postback",
-            payload: "CANVAS_SETUP"
-          },
-          {
-            title: "❓ Help & Support",
-            type: "postback",
-            payload: "HELP_AND_SUPPORT"
-          },
-          {
-            title: "🌟 Upgrade Premium",
-            type: "postback",
-            payload: "UPGRADE_TO_PREMIUM"
-          }
-        ]
-      }
-    ]
-  };
+  const fields = [getStarted && 'get_started', menu && 'persistent_menu'].filter(Boolean);
+  
+  console.log(`Setting up Messenger profile (${fields.join(', ')})...`);
 
   try {
-    await callWithRetry(async () => {
-      const response = await axios.post(
-        `https://graph.facebook.com/v18.0/me/messenger_profile?access_token=${PAGE_ACCESS_TOKEN}`,
-        menuData,
-        {
-          headers: {
-            'Content-Type': 'application/json'
-          }
-        }
-      );
-      console.log('Persistent menu configured successfully:', response.data);
-      return response;
-    });
+    await postMessengerProfile({ menu, getStarted });
     
-    console.log('Menu setup completed successfully');
+    console.log('Profile setup completed successfully');
     
   } catch (error) {
     if (error.response?.data?.error?.code === 613) {
-      console.warn('Rate limit persists for menu after retries.');
-      console.warn('The menu should already be configured from a previous deployment.');
+      console.warn('Rate limit persists for Messenger profile after retries.');
+      console.warn('The profile should already be configured from a previous deployment.');
     } else {
-      console.error('Failed to set persistent menu:', error.response?.data || error.message);
+      console.error('Failed to set Messenger profile:', error.response?.data || error.message);
     }
   }
 }
@@ -3198,8 +2834,9 @@ async function callWithRetry(apiCall, maxRetries = 3, initialDelay = 1000) {
     } catch (error) {
       lastError = error;
       
-      // Check if it's a rate limit error
+      // Check if it's a rate limit error worth waiting out
       if (error.response?.data?.error?.code === 613) {
+        if (i === maxRetries - 1) break; // No attempts left to wait for
         const waitTime = initialDelay * Math.pow(2, i); // Exponential backoff
         console.log(`Rate limit hit. Waiting ${waitTime}ms before retry ${i + 1}/${maxRetries}...`);
         await delay(waitTime);
@@ -3216,9 +2853,9 @@ async function callWithRetry(apiCall, maxRetries = 3, initialDelay = 1000) {
 // Function to verify current menu configuration
 async function verifyMenuConfiguration() {
   try {
-    const response = await axios.get(
-      `https://graph.facebook.com/v18.0/me/messenger_profile?fields=persistent_menu,get_started&access_token=${PAGE_ACCESS_TOKEN}`
-    );
+    const response = await messenger.graphGet(messenger.PROFILE_PATH, {
+      params: { fields: 'persistent_menu,get_started' }
+    });
     
     const hasMenu = response.data?.data?.[0]?.persistent_menu?.length > 0;
     const hasGetStarted = response.data?.data?.[0]?.get_started?.payload === 'GET_STARTED';
@@ -3239,38 +2876,6 @@ async function verifyMenuConfiguration() {
   }
 }
 
-// Function to set up the Get Started button with rate limit handling
-async function setupGetStartedButton() {
-  const buttonData = {
-    get_started: {
-      payload: "GET_STARTED"
-    }
-  };
-
-  try {
-    await callWithRetry(async () => {
-      const response = await axios.post(
-        `https://graph.facebook.com/v18.0/me/messenger_profile?access_token=${PAGE_ACCESS_TOKEN}`,
-        buttonData,
-        {
-          headers: {
-            'Content-Type': 'application/json'
-          }
-        }
-      );
-      console.log('Get Started button configured successfully');
-      return response;
-    });
-  } catch (error) {
-    if (error.response?.data?.error?.code === 613) {
-      console.warn('Rate limit persists for Get Started button after retries.');
-      console.warn('The button should already be configured from a previous deployment.');
-    } else {
-      console.error('Failed to set Get Started button:', error.response?.data || error.message);
-    }
-  }
-}
-
 // Start server
 app.listen(PORT, async () => {
   console.log(`Easely webhook server running on port ${PORT}`);
@@ -3303,15 +2908,10 @@ app.listen(PORT, async () => {
         console.log('Forcing Messenger profile setup as requested...');
       }
       
-      // Setup with delay between calls to avoid rate limiting
-      if (!menuStatus.hasGetStarted) {
-        await setupGetStartedButton();
-        await delay(1000); // Wait 1 second between API calls
-      }
-      
-      if (!menuStatus.hasMenu) {
-        await setupPersistentMenu();
-      }
+      await setupMessengerProfile({
+        menu: !menuStatus.hasMenu,
+        getStarted: !menuStatus.hasGetStarted
+      });
     } else {
       console.log('✓ Messenger profile already configured:');
       console.log(`  - Get Started button: ${menuStatus.hasGetStarted ? '✓' : '✗'}`);
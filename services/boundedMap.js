@@ -0,0 +1,25 @@
+// Size-capped Map shared by the in-process caches
+
+/**
+ * Map capped at maxEntries keys. Writing a key moves it to the end, and a
+ * write that would exceed the cap evicts the least recently written key,
+ * so per-user caches stay bounded however many users the bot has seen.
+ */
+class BoundedMap extends Map {
+  constructor(maxEntries) {
+    super();
+    this.maxEntries = maxEntries;
+  }
+  
+  set(key, value) {
+    this.delete(key);
+    if (this.size >= this.maxEntries) {
+      this.delete(this.keys().next().value);
+    }
+    return super.set(key, value);
+  }
+}
+
+module.exports = {
+  BoundedMap
+};
@@ -0,0 +1,827 @@
+// Canvas API client shared by every Canvas call in the webhook
+const axios = require('axios');
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const https = require('https');
+const { BoundedMap } = require('./boundedMap');
+
+const CANVAS_BASE_URL = process.env.CANVAS_BASE_URL || 'https://dlsu.instructure.com';
+
+// Keep-alive agent so repeated Canvas calls reuse the same TCP+TLS connections
+// instead of paying a fresh handshake per request. LIFO scheduling hands out
+// the most recently used (warm) socket first and lets idle extras time out.
+// Created on first use, so importing this module opens no pool and each
+// process (e.g. the reminder job) builds its own.
+let canvasClient = null;
+
+/**
+ * Get the shared Canvas HTTP client, creating it on first use
+ * @returns {object} Axios instance rooted at the Canvas REST API
+ */
+function getCanvasClient() {
+  if (!canvasClient) {
+    const httpsAgent = new https.Agent({
+      keepAlive: true,
+      maxSockets: 16,
+      maxFreeSockets: 4,
+      scheduling: 'lifo',
+      timeout: 60000
+    });
+    
+    canvasClient = axios.create({
+      baseURL: `${CANVAS_BASE_URL}/api/v1`,
+      httpsAgent,
+      headers: {
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive'
+      }
+    });
+  }
+  return canvasClient;
+}
+
+/**
+ * Build the per-request Authorization header for a Canvas token
+ * @param {string} token - Canvas access token
+ * @returns {object} Headers object
+ */
+function authHeaders(token) {
+  return { 'Authorization': `Bearer ${token}` };
+}
+
+// Canvas rate-limits per token with a leaky bucket (about 700 units) and
+// reports what is left in X-Rate-Limit-Remaining. Track it per token and
+// slow down before the bucket runs dry instead of hitting 403s.
+const RATE_LIMIT_SOFT = 100;
+const RATE_LIMIT_HARD = 20;
+const RATE_LIMIT_STALE_MS = 60 * 1000;
+const rateRemaining = new BoundedMap(10000);
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+// Remember the remaining quota reported on a Canvas response
+function recordRateLimit(hash, response) {
+  const remaining = parseFloat(response?.headers?.['x-rate-limit-remaining']);
+  if (!Number.isNaN(remaining)) {
+    rateRemaining.set(hash, { remaining, seenAt: Date.now() });
+  }
+}
+
+// Delay proportionally as the token's quota drops below the soft limit
+async function throttle(hash) {
+  const entry = rateRemaining.get(hash);
+  if (!entry || Date.now() - entry.seenAt > RATE_LIMIT_STALE_MS) return;
+  
+  const { remaining } = entry;
+  if (remaining >= RATE_LIMIT_SOFT) return;
+  
+  console.warn(`Canvas rate limit low (${remaining} remaining), throttling`);
+  await sleep(remaining < RATE_LIMIT_HARD
+    ? 2000
+    : 250 * (RATE_LIMIT_SOFT - remaining) / RATE_LIMIT_SOFT);
+}
+
+// At most this many requests per token are on the wire at once, across all
+// of that user's concurrent fan-outs, so one user can't self-DDoS Canvas
+const MAX_REQUESTS_PER_TOKEN = 5;
+const tokenSlots = new Map();
+
+async function acquireSlot(hash) {
+  let slots = tokenSlots.get(hash);
+  if (!slots) tokenSlots.set(hash, slots = { active: 0, waiting: [] });
+  
+  if (slots.active >= MAX_REQUESTS_PER_TOKEN) {
+    await new Promise(resolve => slots.waiting.push(resolve));
+  } else {
+    slots.active++;
+  }
+}
+
+function releaseSlot(hash) {
+  const slots = tokenSlots.get(hash);
+  const next = slots.waiting.shift();
+  if (next) {
+    next(); // Hand the slot straight to the next waiter
+  } else if (--slots.active === 0) {
+    tokenSlots.delete(hash);
+  }
+}
+
+// Retries for throttled/transient failures, fewer when the quota is nearly gone
+const MAX_RETRIES = 2;
+
+// Statuses worth retrying on an idempotent request
+const RETRYABLE_STATUSES = new Set([408, 429, 500, 502, 503, 504]);
+
+// Canvas signals throttling with 429, or with 403 "Rate Limit Exceeded"
+function isRateLimited(error) {
+  const status = error.response?.status;
+  if (status === 429) return true;
+  return status === 403 && /rate limit exceeded/i.test(String(error.response?.data || ''));
+}
+
+// Throttling is always safe to retry (Canvas did not process the request);
+// other transient statuses only when repeating the request is harmless
+function shouldRetry(error, idempotent) {
+  return isRateLimited(error) || (idempotent && RETRYABLE_STATUSES.has(error.response?.status));
+}
+
+// Honor Retry-After when present (capped, a user is waiting on the reply),
+// else exponential backoff with full jitter
+const MAX_RETRY_DELAY_MS = 10000;
+
+function retryDelayMs(error, attempt) {
+  const retryAfter = parseFloat(error.response?.headers?.['retry-after']);
+  if (!Number.isNaN(retryAfter)) return Math.min(retryAfter * 1000, MAX_RETRY_DELAY_MS);
+  return Math.random() * 500 * 2 ** (attempt + 1);
+}
+
+// Send a Canvas request with pre-throttling, rate-limit bookkeeping, a
+// per-token concurrency cap and retries when Canvas says to back off (or,
+// for idempotent requests, on transient server errors)
+async function rateLimited(token, send, { idempotent = false } = {}) {
+  const hash = tokenHash(token);
+  
+  for (let attempt = 0; ; attempt++) {
+    await throttle(hash);
+    await acquireSlot(hash);
+    
+    let failure;
+    try {
+      const response = await send();
+      recordRateLimit(hash, response);
+      return response;
+    } catch (error) {
+      recordRateLimit(hash, error.response);
+      failure = error;
+    } finally {
+      releaseSlot(hash);
+    }
+    
+    const remaining = rateRemaining.get(hash)?.remaining ?? Infinity;
+    const maxRetries = remaining < RATE_LIMIT_HARD ? 1 : MAX_RETRIES;
+    if (!shouldRetry(failure, idempotent) || attempt >= maxRetries) throw failure;
+    
+    const delay = retryDelayMs(failure, attempt);
+    console.warn(`Canvas request failed (HTTP ${failure.response.status}), retrying in ${Math.round(delay)}ms`);
+    await sleep(delay);
+  }
+}
+
+// Identical requests already in flight, keyed by token hash + request.
+// Webhook retries and double taps share one Canvas round-trip.
+const inflight = new Map();
+
+/**
+ * Run fn once per key at a time; concurrent callers get the same promise
+ * @param {string} key - Coalescing key
+ * @param {Function} fn - Async function to run
+ * @returns {Promise<*>} Result of the shared call
+ */
+function coalesce(key, fn) {
+  let promise = inflight.get(key);
+  if (!promise) {
+    promise = Promise.resolve()
+      .then(fn)
+      .finally(() => inflight.delete(key));
+    inflight.set(key, promise);
+  }
+  return promise;
+}
+
+/**
+ * GET a Canvas API endpoint
+ * @param {string} token - Canvas access token
+ * @param {string} endpoint - Path relative to /api/v1 (e.g. '/users/self')
+ * @param {object} config - Extra axios config (params, timeout, ...)
+ * @returns {Promise<object>} Axios response
+ */
+function canvasGet(token, endpoint, config = {}) {
+  const key = `${tokenHash(token)}:GET ${endpoint}?${JSON.stringify(config.params || {})}`;
+  return coalesce(key, () => rateLimited(token, () => conditionalGet(key, token, endpoint, config), { idempotent: true }));
+}
+
+// Opt-in conditional GETs: remember each response's ETag and body, send
+// If-None-Match next time, and reuse the stored body on 304 Not Modified.
+// Entries are dropped after ETAG_TTL_MS and the map is capped in size.
+const ETAG_CACHE_ENABLED = process.env.CANVAS_ETAG_CACHE === 'true';
+const ETAG_TTL_MS = 10 * 60 * 1000;
+const ETAG_MAX_ENTRIES = 1000;
+const etagCache = new BoundedMap(ETAG_MAX_ENTRIES);
+
+async function conditionalGet(key, token, endpoint, config) {
+  const headers = { ...config.headers, ...authHeaders(token) };
+  if (!ETAG_CACHE_ENABLED) {
+    return getCanvasClient().get(endpoint, { ...config, headers });
+  }
+  
+  // Hold on to the entry the validator came from: it can be evicted from
+  // the bounded map while the request is in flight, and a 304 still needs it
+  let cachedEntry = etagCache.get(key);
+  if (cachedEntry && Date.now() - cachedEntry.storedAt > ETAG_TTL_MS) {
+    etagCache.delete(key);
+    cachedEntry = undefined;
+  } else if (cachedEntry) {
+    headers['If-None-Match'] = cachedEntry.etag;
+  }
+  
+  const response = await getCanvasClient().get(endpoint, {
+    ...config,
+    headers,
+    validateStatus: status => (status >= 200 && status < 300) || status === 304
+  });
+  
+  if (response.status === 304 && cachedEntry) {
+    // Keep the original Link header so pagination still works
+    return { ...response, status: 200, data: cachedEntry.data, headers: { ...response.headers, link: cachedEntry.link } };
+  }
+  
+  const etag = response.headers?.etag;
+  if (etag) {
+    etagCache.set(key, { etag, data: response.data, link: response.headers.link, storedAt: Date.now() });
+  }
+  return response;
+}
+
+/**
+ * POST to a Canvas API endpoint
+ * @param {string} token - Canvas access token
+ * @param {string} endpoint - Path relative to /api/v1
+ * @param {object} body - JSON request body
+ * @param {object} config - Extra axios config
+ * @returns {Promise<object>} Axios response
+ */
+function canvasPost(token, endpoint, body, config = {}) {
+  return rateLimited(token, () => getCanvasClient().post(endpoint, body, {
+    ...config,
+    headers: { 'Content-Type': 'application/json', ...config.headers, ...authHeaders(token) }
+  }));
+}
+
+// Safety cap so a misbehaving Link header can't loop forever
+const MAX_PAGES = 50;
+
+// One <url>; rel="name" entry of a Link header. Matching the whole header in
+// one scan also copes with commas inside URLs, which a split(',') would break.
+const LINK_PATTERN = /<([^>]*)>\s*;\s*rel="([^"]+)"/g;
+
+/**
+ * Parse a Canvas Link header into a map of rel -> URL
+ * @param {string} linkHeader - Value of the Link response header
+ * @returns {object} e.g. { current, next, first, last }
+ */
+function parseLinks(linkHeader) {
+  const links = {};
+  if (!linkHeader) return links;
+  for (const [, url, rel] of linkHeader.matchAll(LINK_PATTERN)) {
+    links[rel] = url;
+  }
+  return links;
+}
+
+/**
+ * Extract the rel="next" URL from a Canvas Link header
+ * @param {string} linkHeader - Value of the Link response header
+ * @returns {string|null} Absolute URL of the next page, or null on the last page
+ */
+function parseNextLink(linkHeader) {
+  return parseLinks(linkHeader).next || null;
+}
+
+// Yield the page in response, then keep following rel="next" links
+async function* followPages(token, response, timeout) {
+  for (let page = 1; ; page++) {
+    yield response.data || [];
+    
+    const nextUrl = parseNextLink(response.headers?.link);
+    if (!nextUrl || page >= MAX_PAGES) return;
+    
+    // The next URL is absolute and already carries the query string
+    response = await canvasGet(token, nextUrl, { timeout });
+  }
+}
+
+/**
+ * Iterate a paginated Canvas list endpoint one page at a time, following the
+ * Link header; callers can stop early and later pages are never requested
+ * @param {string} token - Canvas access token
+ * @param {string} endpoint - Path relative to /api/v1
+ * @param {object} config - Extra axios config for the first request
+ * @yields {Array<object>} One page of results
+ */
+async function* paginate(token, endpoint, config = {}) {
+  yield* followPages(token, await canvasGet(token, endpoint, config), config.timeout);
+}
+
+/**
+ * Collect every page of a Canvas list endpoint. When the first response
+ * discloses a numeric rel="last" page, the remaining pages are requested
+ * concurrently; otherwise (e.g. bookmark cursors) they are walked in order.
+ * @param {string} token - Canvas access token
+ * @param {string} endpoint - Path relative to /api/v1
+ * @param {object} config - Extra axios config for the first request
+ * @returns {Promise<Array<object>>} All results, in page order
+ */
+async function canvasGetAll(token, endpoint, config = {}) {
+  const first = await canvasGet(token, endpoint, config);
+  const links = parseLinks(first.headers?.link);
+  
+  const lastUrl = links.next && links.last ? new URL(links.last) : null;
+  const lastPage = lastUrl && /^\d+$/.test(lastUrl.searchParams.get('page'))
+    ? Number(lastUrl.searchParams.get('page'))
+    : null;
+  
+  if (lastPage && lastPage <= MAX_PAGES) {
+    const pageUrls = [];
+    for (let page = 2; page <= lastPage; page++) {
+      lastUrl.searchParams.set('page', String(page));
+      pageUrls.push(lastUrl.toString());
+    }
+    
+    const rest = await mapWithConcurrency(pageUrls, MAX_CONCURRENT_REQUESTS, url =>
+      canvasGet(token, url, { timeout: config.timeout })
+    );
+    return [first, ...rest].flatMap(response => response.data || []);
+  }
+  
+  const items = [];
+  for await (const page of followPages(token, first, config.timeout)) {
+    items.push(...page);
+  }
+  return items;
+}
+
+// In-process TTL cache for Canvas reads. Courses change rarely and
+// assignments slowly, so repeated menu taps within the TTL skip Canvas.
+const COURSES_TTL_MS = 10 * 60 * 1000;
+const ASSIGNMENTS_TTL_MS = 5 * 60 * 1000;
+const RESPONSE_CACHE_MAX_ENTRIES = 5000;
+const responseCache = new BoundedMap(RESPONSE_CACHE_MAX_ENTRIES);
+
+/**
+ * Hash a Canvas token for use in cache keys so raw tokens are never stored
+ * @param {string} token - Canvas access token
+ * @returns {string} Hex digest
+ */
+function tokenHash(token) {
+  return crypto.createHash('sha256').update(token).digest('hex').slice(0, 32);
+}
+
+// Optional on-disk copy of the TTL cache so a restarted or freshly scaled
+// instance starts warm instead of re-crawling Canvas for every user.
+// Enabled by pointing CANVAS_CACHE_DIR at a writable directory.
+const CACHE_DIR = process.env.CANVAS_CACHE_DIR || null;
+
+if (CACHE_DIR) {
+  try {
+    fs.mkdirSync(CACHE_DIR, { recursive: true });
+  } catch (error) {
+    console.warn(`Canvas disk cache disabled, cannot create ${CACHE_DIR}:`, error.message);
+  }
+}
+
+// Keys start with the token hash, so the file name keeps that prefix for invalidate()
+function cacheFile(key) {
+  return path.join(CACHE_DIR, `${key.replace(/[^\w.-]/g, '_')}.json`);
+}
+
+async function readDiskCache(key) {
+  if (!CACHE_DIR) return null;
+  try {
+    const entry = JSON.parse(await fs.promises.readFile(cacheFile(key), 'utf8'));
+    return entry.expiresAt > Date.now() ? entry : null;
+  } catch (error) {
+    return null; // Missing or unreadable entries are just cache misses
+  }
+}
+
+async function writeDiskCache(key, entry) {
+  if (!CACHE_DIR) return;
+  const file = cacheFile(key);
+  const tmp = `${file}.${process.pid}.tmp`;
+  try {
+    // Write then rename so concurrent readers never see a partial file
+    await fs.promises.writeFile(tmp, JSON.stringify(entry));
+    await fs.promises.rename(tmp, file);
+  } catch (error) {
+    console.warn(`Failed to write Canvas disk cache for ${key}:`, error.message);
+  }
+}
+
+// Return the cached value for key, or run loader and cache its result;
+// concurrent misses for the same key share a single load
+async function cached(key, ttlMs, forceRefresh, loader) {
+  const entry = responseCache.get(key);
+  if (!forceRefresh && entry && entry.expiresAt > Date.now()) {
+    return entry.value;
+  }
+  
+  return coalesce(`load:${key}`, async () => {
+    if (!forceRefresh) {
+      const diskEntry = await readDiskCache(key);
+      if (diskEntry) {
+        responseCache.set(key, diskEntry);
+        return diskEntry.value;
+      }
+    }
+    
+    const value = await loader();
+    const fresh = { expiresAt: Date.now() + ttlMs, value };
+    responseCache.set(key, fresh);
+    writeDiskCache(key, fresh);
+    return value;
+  });
+}
+
+// Stale-while-revalidate entries: { fetchedAt, value } plus the refresh in flight
+const swrCache = new BoundedMap(RESPONSE_CACHE_MAX_ENTRIES);
+const swrRefreshes = new Map();
+
+function refreshSWR(key, loader) {
+  let refresh = swrRefreshes.get(key);
+  if (!refresh) {
+    refresh = loader()
+      .then(value => {
+        swrCache.set(key, { fetchedAt: Date.now(), value });
+        return value;
+      })
+      .finally(() => swrRefreshes.delete(key));
+    swrRefreshes.set(key, refresh);
+  }
+  return refresh;
+}
+
+/**
+ * Serve a cached value immediately and refresh it in the background once stale
+ * @param {string} key - Cache key (prefix with tokenHash so invalidate() finds it)
+ * @param {number} ttlFreshMs - Age under which the value is returned as-is
+ * @param {number} ttlStaleMs - Age under which the value is returned while refreshing
+ * @param {Function} loader - Async function producing a fresh value
+ * @returns {Promise<*>} Cached or freshly loaded value
+ */
+async function fetchWithSWR(key, ttlFreshMs, ttlStaleMs, loader) {
+  const entry = swrCache.get(key);
+  const age = entry ? Date.now() - entry.fetchedAt : Infinity;
+  
+  if (age < ttlFreshMs) {
+    return entry.value;
+  }
+  
+  if (age < ttlStaleMs) {
+    refreshSWR(key, loader).catch(error => {
+      console.warn(`Background refresh failed for ${key}:`, error.message);
+    });
+    return entry.value;
+  }
+  
+  return refreshSWR(key, loader);
+}
+
+/**
+ * Drop every cached Canvas response for a token
+ * @param {string} token - Canvas access token
+ */
+function invalidate(token) {
+  const hash = tokenHash(token);
+  const prefix = `${hash}:`;
+  for (const cache of [responseCache, swrCache, etagCache]) {
+    for (const key of cache.keys()) {
+      if (key.startsWith(prefix)) cache.delete(key);
+    }
+  }
+  
+  if (CACHE_DIR) {
+    fs.promises.readdir(CACHE_DIR)
+      .then(files => Promise.all(files
+        .filter(file => file.startsWith(`${hash}_`))
+        .map(file => fs.promises.unlink(path.join(CACHE_DIR, file)).catch(() => {}))))
+      .catch(error => console.warn('Failed to clear Canvas disk cache:', error.message));
+  }
+}
+
+/**
+ * Get the user's active courses (cached for 10 minutes)
+ * @param {string} token - Canvas access token
+ * @param {object} options - { forceRefresh }
+ * @returns {Promise<Array<{id: number, name: string}>>} Active courses
+ */
+function getUserCourses(token, { forceRefresh = false } = {}) {
+  return cached(`${tokenHash(token)}:courses`, COURSES_TTL_MS, forceRefresh, async () => {
+    const courses = await canvasGetAll(token, '/courses', {
+      params: {
+        enrollment_state: 'active',
+        per_page: 50
+      },
+      timeout: 15000
+    });
+    return courses.map(c => ({ id: c.id, name: c.name }));
+  });
+}
+
+/**
+ * Get assignments for a course ordered by due date (cached for 5 minutes)
+ * @param {string} token - Canvas access token
+ * @param {number} courseId - Canvas course ID
+ * @param {object} options - { forceRefresh, dueBefore, bucket }; when dueBefore
+ *   is set, pagination stops after the first page reaching past the end of
+ *   that day. bucket filters server-side ('upcoming', 'future', 'past', ...);
+ *   pass null to get every assignment
+ * @returns {Promise<Array<object>>} Canvas assignments, trimmed to listing fields
+ */
+function getCourseAssignments(token, courseId, { forceRefresh = false, dueBefore = null, bucket = 'upcoming' } = {}) {
+  // Results are ordered by due_at, so everything due by the end of
+  // dueBefore's day is covered once a page ends past that point
+  const limitDay = dueBefore ? dueBefore.toISOString().slice(0, 10) : 'all';
+  const limit = dueBefore ? new Date(`${limitDay}T23:59:59.999Z`) : null;
+  
+  const params = { per_page: 100, order_by: 'due_at' };
+  if (bucket) params.bucket = bucket;
+  const endpoint = `/courses/${courseId}/assignments`;
+  
+  return cached(`${tokenHash(token)}:assignments:${courseId}:${bucket || 'all'}:${limitDay}`, ASSIGNMENTS_TTL_MS, forceRefresh, async () => {
+    // Without a cutoff every page is needed, so fetch them concurrently
+    if (!limit) {
+      return (await canvasGetAll(token, endpoint, { params, timeout: 10000 })).map(toListingAssignment);
+    }
+    
+    const assignments = [];
+    const pages = paginate(token, endpoint, { params, timeout: 10000 });
+    
+    for await (const page of pages) {
+      for (const assignment of page) assignments.push(toListingAssignment(assignment));
+      const last = page[page.length - 1];
+      if (limit && last?.due_at && new Date(last.due_at) > limit) break;
+    }
+    return assignments;
+  });
+}
+
+// Keep only the listing fields of a Canvas assignment. The HTML description
+// (usually the bulk of the payload) and rubric/override data are never shown,
+// so they are dropped before caching.
+function toListingAssignment(assignment) {
+  return {
+    id: assignment.id,
+    name: assignment.name,
+    due_at: assignment.due_at,
+    course_id: assignment.course_id,
+    html_url: assignment.html_url,
+    points_possible: assignment.points_possible,
+    submission_types: assignment.submission_types,
+    has_submitted_submissions: assignment.has_submitted_submissions
+  };
+}
+
+// Cap on concurrent Canvas requests for one fan-out, well under the rate limit
+const MAX_CONCURRENT_REQUESTS = 8;
+
+/**
+ * Map items through an async function with at most `limit` calls in flight
+ * @param {Array} items - Inputs
+ * @param {number} limit - Maximum concurrent calls
+ * @param {Function} fn - Async mapper (item, index)
+ * @returns {Promise<Array>} Results in input order
+ */
+async function mapWithConcurrency(items, limit, fn) {
+  const results = new Array(items.length);
+  let next = 0;
+  
+  const worker = async () => {
+    while (next < items.length) {
+      const index = next++;
+      results[index] = await fn(items[index], index);
+    }
+  };
+  
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, worker));
+  return results;
+}
+
+// Opt-in GraphQL path: one POST returns every course's assignments with only
+// the fields the bot needs. Not every Canvas instance exposes GraphQL to
+// personal access tokens, so it is enabled with CANVAS_USE_GRAPHQL=true.
+const GRAPHQL_ENABLED = process.env.CANVAS_USE_GRAPHQL === 'true';
+
+const ASSIGNMENT_FIELDS = `
+  fragment EaselyAssignmentFields on AssignmentConnection {
+    nodes {
+      _id
+      name
+      dueAt
+      pointsPossible
+      htmlUrl
+      submissionTypes
+      hasSubmittedSubmissions
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+`;
+
+const ASSIGNMENTS_QUERY = `
+  query EaselyAssignments {
+    allCourses {
+      _id
+      name
+      assignmentsConnection(first: 100) {
+        ...EaselyAssignmentFields
+      }
+    }
+  }
+  ${ASSIGNMENT_FIELDS}
+`;
+
+// Follow-up pages for a course whose first page came back with hasNextPage
+const COURSE_ASSIGNMENTS_PAGE_QUERY = `
+  query EaselyCourseAssignments($courseId: ID!, $after: String) {
+    course(id: $courseId) {
+      assignmentsConnection(first: 100, after: $after) {
+        ...EaselyAssignmentFields
+      }
+    }
+  }
+  ${ASSIGNMENT_FIELDS}
+`;
+
+/**
+ * Run a Canvas GraphQL query
+ * @param {string} token - Canvas access token
+ * @param {string} query - GraphQL document
+ * @param {object} variables - Query variables
+ * @returns {Promise<object>} The response's data object
+ */
+async function canvasGraphQL(token, query, variables = {}) {
+  // GraphQL lives at /api/graphql, outside the client's /api/v1 base URL
+  const response = await canvasPost(token, `${CANVAS_BASE_URL}/api/graphql`, { query, variables }, {
+    timeout: 20000
+  });
+  
+  if (response.data?.errors?.length) {
+    throw new Error(`Canvas GraphQL error: ${response.data.errors[0].message}`);
+  }
+  return response.data.data;
+}
+
+/**
+ * Get assignments across all of the user's courses in one GraphQL request,
+ * following the connection cursor for courses with more than one page
+ * @param {string} token - Canvas access token
+ * @returns {Promise<Array<object>>} Assignment-shaped objects (id, name, due_at,
+ *   course_id, course_name, html_url, points_possible, submission_types,
+ *   has_submitted_submissions)
+ */
+async function getAssignmentsGraphQL(token) {
+  const data = await canvasGraphQL(token, ASSIGNMENTS_QUERY);
+  const assignments = [];
+  
+  const addNodes = (course, nodes) => {
+    for (const node of nodes || []) {
+      assignments.push({
+        id: Number(node._id),
+        name: node.name,
+        // GraphQL dates carry an offset; normalize to the REST API's UTC format
+        due_at: node.dueAt ? new Date(node.dueAt).toISOString().replace(/\.\d{3}Z$/, 'Z') : null,
+        course_id: Number(course._id),
+        course_name: course.name,
+        html_url: node.htmlUrl,
+        points_possible: node.pointsPossible,
+        submission_types: node.submissionTypes,
+        has_submitted_submissions: node.hasSubmittedSubmissions
+      });
+    }
+  };
+  
+  // Courses are paged concurrently; each course's pages follow its cursor in turn
+  await Promise.all((data?.allCourses || []).map(async course => {
+    let connection = course.assignmentsConnection;
+    addNodes(course, connection?.nodes);
+    
+    while (connection?.pageInfo?.hasNextPage) {
+      const page = await canvasGraphQL(token, COURSE_ASSIGNMENTS_PAGE_QUERY, {
+        courseId: course._id,
+        after: connection.pageInfo.endCursor
+      });
+      connection = page?.course?.assignmentsConnection;
+      addNodes(course, connection?.nodes);
+    }
+  }));
+  return assignments;
+}
+
+// Planner item types that are backed by an assignment with a due date.
+// Discussions only count when graded, i.e. when they carry an assignment_id.
+const PLANNER_ASSIGNMENT_TYPES = new Set(['assignment', 'quiz', 'discussion_topic']);
+
+// The planner omits submission_types; these are implied by the item type.
+// Plain assignments are left undefined, as the planner does not say.
+const PLANNER_SUBMISSION_TYPES = {
+  quiz: ['online_quiz'],
+  discussion_topic: ['discussion_topic']
+};
+
+/**
+ * Get the user's assignments due in a date window from the planner, which
+ * covers every course in a single (paginated) request. Pages are projected
+ * as they arrive, so raw planner items (with their embedded plannable
+ * objects) never accumulate in memory.
+ * @param {string} token - Canvas access token
+ * @param {object} range - { startDate, endDate } as Date objects
+ * @returns {Promise<Array<object>>} Assignment-shaped objects (id, name, due_at,
+ *   course_id, course_name, html_url, points_possible, submission_types,
+ *   has_submitted_submissions); submission_types is only known for quizzes
+ *   and discussions
+ */
+async function getPlannerAssignments(token, { startDate, endDate }) {
+  const assignments = [];
+  const pages = paginate(token, '/planner/items', {
+    params: {
+      start_date: startDate.toISOString(),
+      end_date: endDate.toISOString(),
+      per_page: 100
+    },
+    timeout: 15000
+  });
+  
+  for await (const page of pages) {
+    for (const item of page) {
+      if (!PLANNER_ASSIGNMENT_TYPES.has(item.plannable_type) || !item.course_id) continue;
+      if (item.plannable_type === 'discussion_topic' && !item.plannable?.assignment_id) continue;
+      assignments.push({
+        // Quizzes and discussions have their own plannable ids; use the backing assignment's
+        id: item.plannable?.assignment_id ?? item.plannable_id,
+        name: item.plannable?.title,
+        due_at: item.plannable?.due_at || item.plannable_date,
+        course_id: item.course_id,
+        course_name: item.context_name,
+        // Planner URLs are site-relative
+        html_url: item.html_url?.startsWith('/') ? `${CANVAS_BASE_URL}${item.html_url}` : item.html_url,
+        points_possible: item.plannable?.points_possible,
+        submission_types: PLANNER_SUBMISSION_TYPES[item.plannable_type],
+        has_submitted_submissions: Boolean(item.submissions?.submitted)
+      });
+    }
+  }
+  return assignments;
+}
+
+// Canvas caps calendar_events at 10 context codes per request
+const CALENDAR_CONTEXTS_PER_REQUEST = 10;
+
+/**
+ * Get assignments due in a date window across many courses using the
+ * calendar events index, instead of one assignments request per course
+ * @param {string} token - Canvas access token
+ * @param {Array<number>} courseIds - Canvas course IDs
+ * @param {object} range - { startDate, endDate } as Date objects
+ * @returns {Promise<Array<object>>} Canvas assignment objects (with course_id)
+ */
+async function getUpcomingAssignmentsBulk(token, courseIds, { startDate, endDate }) {
+  const groups = [];
+  for (let i = 0; i < courseIds.length; i += CALENDAR_CONTEXTS_PER_REQUEST) {
+    groups.push(courseIds.slice(i, i + CALENDAR_CONTEXTS_PER_REQUEST));
+  }
+
+  const pages = await mapWithConcurrency(groups, MAX_CONCURRENT_REQUESTS, group =>
+    canvasGetAll(token, '/calendar_events', {
+      params: {
+        type: 'assignment',
+        start_date: startDate.toISOString(),
+        end_date: endDate.toISOString(),
+        context_codes: group.map(id => `course_${id}`),
+        excludes: ['description', 'child_events'], // Unused and the bulk of the payload
+        per_page: 100
+      },
+      timeout: 15000
+    })
+  );
+
+  // Each assignment event embeds the full assignment object
+  return pages.flat()
+    .map(event => event.assignment)
+    .filter(Boolean);
+}
+
+module.exports = {
+  CANVAS_BASE_URL,
+  getCanvasClient,
+  canvasGet,
+  canvasPost,
+  paginate,
+  canvasGetAll,
+  tokenHash,
+  isRateLimited,
+  getUserCourses,
+  getCourseAssignments,
+  getUpcomingAssignmentsBulk,
+  getPlannerAssignments,
+  GRAPHQL_ENABLED,
+  getAssignmentsGraphQL,
+  mapWithConcurrency,
+  MAX_CONCURRENT_REQUESTS,
+  fetchWithSWR,
+  invalidate
+};
@@ -1,29 +1,12 @@
 // Database service for Supabase integration
 const { createClient } = require('@supabase/supabase-js');
 const CryptoJS = require('crypto-js');
+const { BoundedMap } = require('./boundedMap');
+const { MANILA_DATE_TIME_FORMAT, getManilaParts } = require('./manilaTime');
 
 // Helper function to get Manila timezone date parts
 function getManilaDateParts(date = new Date()) {
-  const formatter = new Intl.DateTimeFormat('en-CA', {
-    timeZone: 'Asia/Manila',
-    year: 'numeric',
-    month: '2-digit',
-    day: '2-digit',
-    hour: '2-digit',
-    minute: '2-digit',
-    second: '2-digit',
-    hour12: false
-  });
-  
-  const parts = formatter.formatToParts(date);
-  return {
-    year: parseInt(parts.find(p => p.type === 'year').value),
-    month: parseInt(parts.find(p => p.type === 'month').value),
-    day: parseInt(parts.find(p => p.type === 'day').value),
-    hour: parseInt(parts.find(p => p.type === 'hour').value),
-    minute: parseInt(parts.find(p => p.type === 'minute').value),
-    second: parseInt(parts.find(p => p.type === 'second').value)
-  };
+  return getManilaParts(MANILA_DATE_TIME_FORMAT, date);
 }
 
 // Helper function to create Manila timezone Date object
@@ -54,8 +37,28 @@ function decryptToken(encryptedToken) {
   }
 }
 
+// Short-lived cache of user rows by sender id. Handling one message looks
+// the same user up several times (the handler itself plus every session
+// read and write), so a few seconds collapses those into one query.
+// createUser/updateUser refresh the entry with the row they return.
+const USER_CACHE_TTL_MS = 5000;
+const userCache = new BoundedMap(10000);
+
+function cacheUser(senderId, user) {
+  if (user) {
+    userCache.set(senderId, { expiresAt: Date.now() + USER_CACHE_TTL_MS, user });
+  } else {
+    userCache.delete(senderId);
+  }
+}
+
 // User management functions
 async function getUser(senderId) {
+  const cachedEntry = userCache.get(senderId);
+  if (cachedEntry && cachedEntry.expiresAt > Date.now()) {
+    return cachedEntry.user;
+  }
+  
   try {
     const { data, error } = await supabase
       .from('users')
@@ -73,6 +76,7 @@ async function getUser(senderId) {
       data.canvas_token = decryptToken(data.canvas_token);
     }
     
+    cacheUser(senderId, data);
     return data;
   } catch (err) {
     console.error('Database error in getUser:', err);
@@ -101,6 +105,7 @@ async function createUser(senderId) {
       return null;
     }
     
+    cacheUser(senderId, data);
     return data;
   } catch (err) {
     console.error('Database error in createUser:', err);
@@ -109,6 +114,9 @@ async function createUser(senderId) {
 }
 
 async function updateUser(senderId, updates) {
+  // Drop the cached row up front so a failed update can't leave it stale
+  userCache.delete(senderId);
+  
   try {
     // Encrypt canvas token if being updated
     if (updates.canvas_token) {
@@ -140,6 +148,7 @@ async function updateUser(senderId, updates) {
       data.canvas_token = decryptToken(data.canvas_token);
     }
     
+    cacheUser(senderId, data);
     return data;
   } catch (err) {
     console.error('Database error in updateUser:', err);
@@ -154,11 +163,14 @@ async function getUserSession(senderId) {
     const user = await getUser(senderId);
     if (!user) return null;
     
+    // Expired sessions are ignored here rather than waiting for the hourly
+    // cleanup; only the session payload is needed
     const { data, error } = await supabase
       .from('user_sessions')
-      .select('*')
+      .select('session_data')
       .eq('user_id', user.id)
       .eq('is_active', true)
+      .gt('expires_at', new Date().toISOString())
       .single();
     
     if (error && error.code !== 'PGRST116') {
@@ -174,6 +186,40 @@ async function getUserSession(senderId) {
   }
 }
 
+// User row plus its live session in a single request: the session is
+// embedded through the user_sessions foreign key instead of fetched after
+// a separate user lookup
+async function getUserWithSession(senderId) {
+  try {
+    const { data, error } = await supabase
+      .from('users')
+      .select('*, user_sessions(session_data)')
+      .eq('sender_id', senderId)
+      .eq('user_sessions.is_active', true)
+      .gt('user_sessions.expires_at', new Date().toISOString())
+      .single();
+    
+    if (error && error.code !== 'PGRST116') {
+      console.error('Error fetching user with session:', error);
+      return { user: null, session: null };
+    }
+    if (!data) return { user: null, session: null };
+    
+    const { user_sessions: sessions, ...user } = data;
+    
+    // Decrypt canvas token if present
+    if (user.canvas_token) {
+      user.canvas_token = decryptToken(user.canvas_token);
+    }
+    
+    cacheUser(senderId, user);
+    return { user, session: sessions?.[0]?.session_data || null };
+  } catch (err) {
+    console.error('Database error in getUserWithSession:', err);
+    return { user: null, session: null };
+  }
+}
+
 async function setUserSession(senderId, sessionData) {
   try {
     const user = await getUser(senderId);
@@ -669,6 +715,7 @@ module.exports = {
   createUser,
   updateUser,
   getUserSession,
+  getUserWithSession,
   setUserSession,
   clearUserSession,
   getUserTasks,
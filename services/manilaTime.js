@@ -0,0 +1,40 @@
+// Asia/Manila date formatting shared by the webhook and the database service
+
+// Intl formatters are expensive to construct, so the Manila ones are built
+// once here and shared by every date helper
+const MANILA_DATE_FORMAT = new Intl.DateTimeFormat('en-CA', {
+  timeZone: 'Asia/Manila',
+  year: 'numeric',
+  month: '2-digit',
+  day: '2-digit'
+});
+const MANILA_DATE_TIME_FORMAT = new Intl.DateTimeFormat('en-CA', {
+  timeZone: 'Asia/Manila',
+  year: 'numeric',
+  month: '2-digit',
+  day: '2-digit',
+  hour: '2-digit',
+  minute: '2-digit',
+  second: '2-digit',
+  hourCycle: 'h23' // 00-23; hour12: false reports midnight as 24
+});
+const MANILA_WEEKDAY_FORMAT = new Intl.DateTimeFormat('en-US', {
+  timeZone: 'Asia/Manila',
+  weekday: 'long'
+});
+
+// Numeric date/time fields of `date` as seen by `formatter`, read in one pass
+function getManilaParts(formatter, date) {
+  const fields = {};
+  for (const { type, value } of formatter.formatToParts(date)) {
+    if (type !== 'literal') fields[type] = parseInt(value, 10);
+  }
+  return fields;
+}
+
+module.exports = {
+  MANILA_DATE_FORMAT,
+  MANILA_DATE_TIME_FORMAT,
+  MANILA_WEEKDAY_FORMAT,
+  getManilaParts
+};
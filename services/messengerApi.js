@@ -0,0 +1,183 @@
+// Facebook Graph API client shared by every Messenger call
+const axios = require('axios');
+const https = require('https');
+const zlib = require('zlib');
+
+const PAGE_ACCESS_TOKEN = process.env.PAGE_ACCESS_TOKEN;
+const GRAPH_API_URL = 'https://graph.facebook.com/v18.0';
+
+// Paths used on every send / profile update, relative to GRAPH_API_URL
+const MESSAGES_PATH = '/me/messages';
+const PROFILE_PATH = '/me/messenger_profile';
+
+// Graph batch requests accept at most 50 subrequests, each addressed by a
+// relative_url without the leading slash
+const MAX_BATCH_SIZE = 50;
+const BATCH_MESSAGES_URL = MESSAGES_PATH.slice(1);
+
+// Opt-in gzip for larger request bodies (menus, batches, broadcasts); level 1
+// gets most of the size win for almost no CPU
+const GZIP_REQUESTS = process.env.GRAPH_GZIP_REQUESTS === 'true';
+const GZIP_MIN_BYTES = 512;
+
+// Keep-alive agent so message sends reuse pooled TCP+TLS connections to
+// graph.facebook.com instead of paying a handshake per message
+const httpsAgent = new https.Agent({
+  keepAlive: true,
+  maxSockets: 50,
+  maxFreeSockets: 10
+});
+
+// The page access token rides along as a default query param, so call
+// sites only pass the path and body
+const graphClient = axios.create({
+  baseURL: GRAPH_API_URL,
+  httpsAgent,
+  params: { access_token: PAGE_ACCESS_TOKEN },
+  headers: {
+    'Content-Type': 'application/json',
+    'Connection': 'keep-alive'
+  }
+});
+
+// Gzip a serialized body once it is large enough to be worth it
+function compressBody(data, headers) {
+  if (typeof data !== 'string' || Buffer.byteLength(data) < GZIP_MIN_BYTES) return data;
+  headers.set('Content-Encoding', 'gzip');
+  return zlib.gzipSync(data, { level: 1 });
+}
+
+if (GZIP_REQUESTS) {
+  // Runs after axios has serialized the body to a JSON string
+  graphClient.defaults.transformRequest = [...axios.defaults.transformRequest, compressBody];
+}
+
+// Bodies that are already JSON strings skip axios's default transform, which
+// would otherwise JSON.parse every string body to validate it before sending
+const RAW_TRANSFORM_REQUEST = GZIP_REQUESTS ? [compressBody] : [data => data];
+
+// Reads are retried on transient gateway errors; sends are not, since a
+// POST that reached Facebook before failing would deliver twice
+const MAX_GET_RETRIES = 2;
+const RETRYABLE_STATUSES = new Set([502, 503, 504]);
+
+function sleep(ms) {
+  return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+/**
+ * GET a Graph API endpoint, retrying 502/503/504 with a short backoff
+ * @param {string} endpoint - Path relative to the Graph API version root
+ * @param {object} config - Extra axios config (params, timeout, ...)
+ * @returns {Promise<object>} Axios response
+ */
+async function graphGet(endpoint, config = {}) {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await graphClient.get(endpoint, config);
+    } catch (error) {
+      if (attempt >= MAX_GET_RETRIES || !RETRYABLE_STATUSES.has(error.response?.status)) {
+        throw error;
+      }
+      await sleep(200 * 2 ** attempt);
+    }
+  }
+}
+
+/**
+ * POST to a Graph API endpoint. String bodies are taken to be serialized
+ * JSON and are sent as-is.
+ * @param {string} endpoint - Path relative to the Graph API version root
+ * @param {object|string} body - JSON request body, or its JSON string
+ * @param {object} config - Extra axios config
+ * @returns {Promise<object>} Axios response
+ */
+function graphPost(endpoint, body, config = {}) {
+  if (typeof body === 'string') {
+    config = { transformRequest: RAW_TRANSFORM_REQUEST, ...config };
+  }
+  return graphClient.post(endpoint, body, config);
+}
+
+/**
+ * Send a message through the Send API
+ * @param {object|string} messageData - { recipient, message } or { recipient, sender_action }, or its JSON string
+ * @returns {Promise<object>} Axios response
+ */
+function callSendAPI(messageData) {
+  return graphPost(MESSAGES_PATH, messageData);
+}
+
+/**
+ * Show (or clear) the typing indicator without waiting on the Graph call.
+ * The indicator is only a UX hint, so callers never block on it and
+ * failures are logged and otherwise ignored.
+ * @param {string} recipientId - Messenger PSID
+ * @param {string} action - 'typing_on', 'typing_off' or 'mark_seen'
+ */
+function sendTypingIndicator(recipientId, action = 'typing_on') {
+  callSendAPI({ recipient: { id: recipientId }, sender_action: action })
+    .catch(error => {
+      console.warn(`Typing indicator (${action}) failed:`, error.response?.data || error.message);
+    });
+}
+
+/**
+ * Send several messages in one Graph batch request per 50 messages. Each
+ * subrequest depends on the one before it, so Messenger still delivers them
+ * in order, but the whole run costs a single round trip. A chunk whose
+ * request fails stops the run, since later chunks would arrive out of order.
+ * @param {object[]} messages - Send API payloads ({ recipient, message })
+ * @returns {Promise<Array<object|null>>} One entry per message, in order: its
+ *   batch result ({ code, body }), or null if it was skipped or never sent
+ */
+async function sendBatch(messages) {
+  const results = new Array(messages.length).fill(null);
+  
+  for (let start = 0; start < messages.length; start += MAX_BATCH_SIZE) {
+    const batch = messages.slice(start, start + MAX_BATCH_SIZE).map((messageData, i) => {
+      // Subrequest bodies are form-encoded with JSON values, like a plain Send API call
+      const body = new URLSearchParams();
+      for (const [key, value] of Object.entries(messageData)) {
+        body.append(key, typeof value === 'string' ? value : JSON.stringify(value));
+      }
+      
+      const request = {
+        method: 'POST',
+        relative_url: BATCH_MESSAGES_URL,
+        name: `message${i}`,
+        omit_response_on_success: false,
+        body: body.toString()
+      };
+      if (i > 0) request.depends_on = `message${i - 1}`;
+      return request;
+    });
+    
+    try {
+      const response = await graphPost('/', {
+        batch: JSON.stringify(batch),
+        include_headers: false
+      });
+      response.data.forEach((result, i) => {
+        results[start + i] = result;
+      });
+    } catch (error) {
+      console.error(`Batch request for messages ${start}-${start + batch.length - 1} failed:`, error.response?.data || error.message);
+      break;
+    }
+  }
+  
+  return results;
+}
+
+module.exports = {
+  GRAPH_API_URL,
+  MESSAGES_PATH,
+  PROFILE_PATH,
+  graphClient,
+  graphGet,
+  graphPost,
+  callSendAPI,
+  sendTypingIndicator,
+  sendBatch
+};
@@ -1,9 +1,6 @@
 // Reminder service for handling deadline notifications
 const db = require('./database');
-const axios = require('axios');
-
-const PAGE_ACCESS_TOKEN = process.env.PAGE_ACCESS_TOKEN;
-const GRAPH_API_URL = 'https://graph.facebook.com/v18.0';
+const messenger = require('./messengerApi');
 
 /**
  * Send a reminder message to a user via Facebook Messenger
@@ -26,16 +23,10 @@ async function sendReminderMessage(senderId, task, reminderType) {
     };
 
     // Send message via Facebook Messenger API
-    const response = await axios.post(
-      `${GRAPH_API_URL}/me/messages`,
-      {
-        recipient: { id: senderId },
-        message: message
-      },
-      {
-        params: { access_token: PAGE_ACCESS_TOKEN }
-      }
-    );
+    const response = await messenger.callSendAPI({
+      recipient: { id: senderId },
+      message: message
+    });
 
     console.log(`Reminder sent to ${senderId} for task ${task.id}`);
     return true;